@@ -1,76 +1,238 @@
 """-------------------------------------By: Damodhar Pai------------------------------------------------"""
 import argparse
+import io
+import lzma
+import os
+import struct
 import sys
+import zlib
+from cryptography.exceptions import InvalidTag
 from PIL import Image
 
-def generate_key(password, length=32):
-    """Generates a 256-bit (32-byte) key by repeating or truncating the password."""
-    password = password.encode()
-    return (password * (length // len(password) + 1))[:length]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # stego_core and stage_trace live at the repository root
+from stage_trace import StageTracer, trace_stage, traced
+from stego_core import *  # the shared engine, re-exported for callers that load this script as a module
 
-def xor_encrypt(data, key):
-    """Encrypts data using XOR with a 256-bit key."""
-    return bytearray(d ^ key[i % len(key)] for i, d in enumerate(data))
+ENCODINGS = {"raw": ENCODING_RGBA, "file": ENCODING_FILE, "zlib": ENCODING_ZLIB, "lzma": ENCODING_LZMA}
+NATIVE_MODES = ("L", "LA", "RGB", "RGBA")  # one byte per band, so len(mode) is bytes per pixel
 
 def image_to_bytes(image):
-    """Convert image to bytes with dimensions."""
+    """Convert image to bytes with dimensions; the RGBA pixels are written band by band into one buffer."""
     width, height = image.size
-    pixels = image.convert("RGBA").tobytes()
-    dimension_bytes = width.to_bytes(2, 'big') + height.to_bytes(2, 'big')
-    return dimension_bytes + pixels
+    data = bytearray(4 + width * height * 4)
+    data[:4] = width.to_bytes(2, 'big') + height.to_bytes(2, 'big')
+    for top, bottom, strip in image_strips(image, "RGBA"):
+        data[4 + top * width * 4:4 + bottom * width * 4] = strip
+    return data
 
 def bytes_to_image(data):
     """Convert bytes back to image."""
     width = int.from_bytes(data[:2], 'big')
     height = int.from_bytes(data[2:4], 'big')
-    pixel_data = data[4:]
-    return Image.frombytes("RGBA", (width, height), pixel_data)
-
-def embed_message_in_image(pixels, width, height, message_bytes):
-    """Embeds byte-aligned message data into the LSBs of an image's RGB channels."""
-    data_index = 0
-    for y in range(height):
-        for x in range(width):
-            if data_index >= len(message_bytes) * 8:
-                return
-            r, g, b, a = pixels[x, y]
-            if data_index < len(message_bytes) * 8:
-                r = (r & 0xFE) | ((message_bytes[data_index // 8] >> (7 - (data_index % 8))) & 1)
-                data_index += 1
-            if data_index < len(message_bytes) * 8:
-                g = (g & 0xFE) | ((message_bytes[data_index // 8] >> (7 - (data_index % 8))) & 1)
-                data_index += 1
-            if data_index < len(message_bytes) * 8:
-                b = (b & 0xFE) | ((message_bytes[data_index // 8] >> (7 - (data_index % 8))) & 1)
-                data_index += 1
-            pixels[x, y] = (r, g, b, a)
-
-def extract_message_from_image(pixels, width, height, num_bytes):
-    """Extracts byte-aligned message data from the LSBs of an image's RGB channels."""
-    bits = []
-    data_index = 0
-    for y in range(height):
-        for x in range(width):
-            if data_index >= num_bytes * 8:
-                break
-            r, g, b, a = pixels[x, y]
-            bits.append((r & 1))
-            data_index += 1
-            if data_index < num_bytes * 8:
-                bits.append((g & 1))
-                data_index += 1
-            if data_index < num_bytes * 8:
-                bits.append((b & 1))
-                data_index += 1
-
-    message_bytes = bytearray()
-    for i in range(0, len(bits), 8):
-        byte = 0
-        for bit in bits[i:i+8]:
-            byte = (byte << 1) | bit
-        message_bytes.append(byte)
-
-    return message_bytes
+    return Image.frombuffer("RGBA", (width, height), memoryview(data)[4:], "raw", "RGBA", 0, 1)
+
+def compress_pixels(image, encoding):
+    """Packs mode, dimensions and zlib/LZMA-compressed pixels of an image in its native mode.
+
+    Pixels are fed to the compressor band by band, so no uncompressed copy of the whole image is made.
+    """
+    mode = image.mode if image.mode in NATIVE_MODES else "RGBA"
+    compressor = zlib.compressobj(9) if encoding == ENCODING_ZLIB else lzma.LZMACompressor()
+    compressed = [compressor.compress(strip) for _, _, strip in image_strips(image, mode)]
+    compressed.append(compressor.flush())
+    return bytes([len(mode)]) + mode.encode("ascii") + struct.pack(">II", *image.size) + b"".join(compressed)
+
+def decompress_pixels(data, encoding):
+    """Inverse of compress_pixels; output is capped at the size implied by the stored dimensions."""
+    mode_length = data[0]
+    mode = bytes(data[1:1 + mode_length]).decode("ascii")
+    if mode not in NATIVE_MODES:
+        raise ValueError(f"Unsupported image mode {mode}")
+    width, height = struct.unpack(">II", data[1 + mode_length:9 + mode_length])
+    expected = width * height * len(mode)
+    decompressor = zlib.decompressobj() if encoding == ENCODING_ZLIB else lzma.LZMADecompressor()
+    pixels = decompressor.decompress(memoryview(data)[9 + mode_length:], expected)
+    if len(pixels) != expected:
+        raise ValueError("Corrupted pixel data")
+    return Image.frombuffer(mode, (width, height), pixels, "raw", mode, 0, 1)
+
+def encode_secret(secret_path, encoding="auto"):
+    """Serializes the secret image for embedding and returns (encoding id, payload bytes).
+
+    secret_path may also be the image file's contents as bytes. "auto" picks
+    the smaller of the original file bytes and zlib-compressed native pixels;
+    "raw" is the uncompressed RGBA layout of older versions.
+    """
+    if isinstance(secret_path, (bytes, bytearray)):
+        file_bytes = bytes(secret_path)
+    else:
+        with open(secret_path, "rb") as f:
+            file_bytes = f.read()
+    if encoding == "file":
+        return ENCODING_FILE, file_bytes
+    secret_image = Image.open(io.BytesIO(file_bytes))
+    if encoding == "raw":
+        return ENCODING_RGBA, image_to_bytes(secret_image)
+    if encoding == "auto":
+        candidates = [(ENCODING_FILE, file_bytes), (ENCODING_ZLIB, compress_pixels(secret_image, ENCODING_ZLIB))]
+        return min(candidates, key=lambda candidate: len(candidate[1]))
+    return ENCODINGS[encoding], compress_pixels(secret_image, ENCODINGS[encoding])
+
+def decode_secret(encoding, data):
+    """Rebuilds the secret image; returns (image, original file bytes or None)."""
+    if encoding == ENCODING_RGBA:
+        return bytes_to_image(data), None
+    if encoding == ENCODING_FILE:
+        secret_image = Image.open(io.BytesIO(data))
+        secret_image.load()
+        return secret_image, bytes(data)
+    if encoding in (ENCODING_ZLIB, ENCODING_LZMA):
+        return decompress_pixels(data, encoding), None
+    raise ValueError(f"Unknown payload encoding {encoding}")
+
+def save_secret(secret_image, file_bytes, output_path):
+    """Writes the original file bytes when the output extension matches their format, else re-encodes."""
+    extension = os.path.splitext(output_path)[1].lower()
+    if file_bytes is not None and Image.registered_extensions().get(extension) == secret_image.format:
+        with open(output_path, "wb") as f:
+            f.write(file_bytes)
+    else:
+        secret_image.save(output_path)
+
+@traced("hide_image")
+def hide_image(cover_path, secret_path, output_path, password, *, cipher_id=CIPHER_GCM, stream=False, strip_rows=STRIP_ROWS,
+               bits_per_channel=1, use_alpha=False, encoding="auto", kdf_id=KDF_SCRYPT, salt=None, scatter=False,
+               profile="balanced", threads=1):
+    """Encrypts the secret image, embeds it into the cover image and saves the stego image.
+
+    secret_path may also hold the secret file's bytes. encoding selects how
+    the secret is serialized (see encode_secret), and bits_per_channel and
+    use_alpha choose the body's bit layout (recorded in the header). The key
+    is derived from password with kdf_id and salt (a fresh random salt by
+    default). With stream=True the cover must be a PNG and is processed in
+    strips of strip_rows rows instead of being loaded whole. With
+    scatter=True the body goes to key-dependent pseudo-random positions.
+    profile and threads control the output encoder (see save_stego_image);
+    returns an EncodeReport (for streaming, its time covers the whole pass).
+    tracer (a StageTracer) records the time and memory of each stage.
+    """
+    if scatter and stream:
+        raise ValueError("Scatter mode cannot be combined with streaming.")
+    # Serialize the secret image and encrypt it with AES-256
+    with trace_stage("encode_secret") as stage:
+        encoding_id, secret_bytes = encode_secret(secret_path, encoding)
+        stage["bytes"] = len(secret_bytes)
+    flags = (FLAG_ALPHA if use_alpha else 0) | (FLAG_SCATTER if scatter else 0)
+    encrypted_secret, key = pack_envelope(secret_bytes, password, cipher_id, encoding_id, bits_per_channel, flags, kdf_id, salt)
+    return embed_envelope_in_cover(cover_path, output_path, encrypted_secret, key, stream=stream, strip_rows=strip_rows,
+                                   bits_per_channel=bits_per_channel, use_alpha=use_alpha, scatter=scatter, profile=profile,
+                                   threads=threads,
+                                   too_large="Secret image is too large to fit into the cover image; pass several covers to split it.")
+
+@traced("reveal_image")
+def reveal_image(stego_path, output_path, password):
+    """Extracts and decrypts the hidden image; raises ValueError on a wrong password or corrupted data.
+
+    PNG rows are decoded only up to the last one holding the payload.
+    tracer (a StageTracer) records the time and memory of each stage.
+    """
+    stego = StegoPixels(stego_path)
+    pixels = stego.pixels
+
+    # Read magic and version once; images without the magic hold legacy XOR data
+    height, width = pixels.shape[:2]
+    capacity = capacity_bytes(width, height)
+    reader = LSBReader(pixels)
+
+    try:
+        stego.ensure(BODY_START_PIXEL)  # covers the prefix and the whole header
+        prefix = reader.read(PREFIX_SIZE)
+        if prefix[:len(MAGIC)] != MAGIC:
+            # Legacy layout: XOR-encrypted dimensions followed by RGBA pixels
+            key = legacy_key(password)
+            dimensions = xor_encrypt(prefix[:4], key)
+            secret_width = int.from_bytes(dimensions[:2], 'big')
+            secret_height = int.from_bytes(dimensions[2:4], 'big')
+            if secret_width * secret_height * 4 > capacity - 4:
+                raise ValueError("Image size exceeds stego image capacity")
+            stego.ensure(-(-(4 + secret_width * secret_height * 4) * 8 // 3))
+            with trace_stage("extract", secret_width * secret_height * 4):
+                encrypted_data = prefix[:4] + reader.read(secret_width * secret_height * 4)
+            with trace_stage("xor_decrypt", len(encrypted_data)):
+                decrypted_data = xor_encrypt(encrypted_data, key)
+            with trace_stage("decode_secret", len(decrypted_data)):
+                secret_image, file_bytes = decode_secret(ENCODING_RGBA, decrypted_data)
+        else:
+            # Header is verified before a single body bit is read
+            header, key = unpack_header(prefix + reader.read(HEADER_SIZE - PREFIX_SIZE), password, width, height)
+            if header.flags & FLAG_SHARD:
+                raise ShardError("This image holds one shard of a split payload; retrieve it together with the other shard images.")
+            if header.encoding not in ENCODINGS.values():
+                raise PayloadKindError(f"This image holds {payload_kind(header.encoding)}, not an image.")
+            stego.ensure(body_end_pixel(header, width, height))
+            with trace_stage("extract", header.body_length):
+                encrypted_data = body_reader(pixels, header, reader, key).read(header.body_length)
+            with trace_stage("decrypt", header.body_length):
+                decrypted_data = aes_decrypt(encrypted_data, key, header.cipher_id, header.nonce)
+            with trace_stage("decode_secret", len(decrypted_data)):
+                secret_image, file_bytes = decode_secret(header.encoding, decrypted_data)
+    except (ShardError, PayloadKindError):
+        raise
+    except (InvalidTag, ValueError, OSError, zlib.error, lzma.LZMAError):
+        raise ValueError("Invalid password or corrupted data") from None
+    finally:
+        stego.close()
+    with trace_stage("save_secret"):
+        save_secret(secret_image, file_bytes, output_path)
+
+@traced("hide_image_shards")
+def hide_image_shards(cover_paths, secret_path, output_paths, password, *, cipher_id=CIPHER_GCM, bits_per_channel=1, use_alpha=False,
+                      encoding="auto", kdf_id=KDF_SCRYPT, salt=None, scatter=False, profile="balanced", threads=1, workers=None):
+    """Encrypts the secret image and spreads it over several covers in parallel (see embed_shards).
+
+    Returns the EncodeReport of every output.
+    """
+    with trace_stage("encode_secret") as stage:
+        encoding_id, secret_bytes = encode_secret(secret_path, encoding)
+        stage["bytes"] = len(secret_bytes)
+    return embed_shards(cover_paths, output_paths, secret_bytes, password, cipher_id=cipher_id, encoding=encoding_id,
+                        bits_per_channel=bits_per_channel, use_alpha=use_alpha, kdf_id=kdf_id, salt=salt, scatter=scatter,
+                        profile=profile, threads=threads, workers=workers)
+
+@traced("reveal_image_shards")
+def reveal_image_shards(stego_paths, output_path, password, workers=None):
+    """Reassembles and decrypts a hidden image split over shard images, given in any order.
+
+    Raises ShardError for missing, duplicate or foreign shards and ValueError on a wrong password or corrupted data.
+    """
+    try:
+        header, decrypted_data = extract_shards(stego_paths, password, workers)
+        if header.encoding not in ENCODINGS.values():
+            raise PayloadKindError(f"These shards hold {payload_kind(header.encoding)}, not an image.")
+        with trace_stage("decode_secret", len(decrypted_data)):
+            secret_image, file_bytes = decode_secret(header.encoding, decrypted_data)
+    except (ShardError, PayloadKindError, FileNotFoundError):
+        raise
+    except (InvalidTag, ValueError, OSError, zlib.error, lzma.LZMAError):
+        raise ValueError("Invalid password or corrupted data") from None
+    with trace_stage("save_secret"):
+        save_secret(secret_image, file_bytes, output_path)
+
+def run_batch_job(job):
+    """Runs one manifest row in a worker process and returns (row, error or None, output path, trace events or None)."""
+    row, action, entry, password, cipher_id, kdf_id, salt, trace = job
+    tracer = StageTracer() if trace else None
+    try:
+        if action == "save":
+            hide_image(entry["cover"], entry["payload"], entry["output"], password,
+                       cipher_id=cipher_id, kdf_id=kdf_id, salt=salt, tracer=tracer)
+        else:
+            reveal_image(entry["stego"], entry["output"], password, tracer=tracer)
+        return row, None, entry["output"], tracer and tracer.events
+    except KeyError as e:
+        return row, f"Missing manifest column {e}", None, tracer and tracer.events
+    except Exception as e:
+        return row, str(e), None, tracer and tracer.events
 
 def main():
     parser = argparse.ArgumentParser(description="Embed or retrieve an image within another image using LSB steganography.")
@@ -78,51 +240,74 @@ def main():
 
     # Save command
     save_parser = subparsers.add_parser("save", help="Embed secret image into cover image.")
-    save_parser.add_argument("-i", "--input", required=True, help="Path to the cover image.")
+    save_parser.add_argument("-i", "--input", required=True, nargs="+", help="Path to the cover image; several covers split the payload into shards.")
     save_parser.add_argument("-s", "--secret", required=True, help="Path to the secret image.")
-    save_parser.add_argument("-o", "--output", required=True, help="Output path for the stego image.")
+    save_parser.add_argument("-o", "--output", required=True, nargs="+", help="Output path for the stego image (one per cover).")
+    save_parser.add_argument("--cipher", choices=sorted(CIPHERS), default="gcm", help="AES-256 mode: gcm (authenticated, default) or ctr.")
+    save_parser.add_argument("--encoding", choices=["auto"] + sorted(ENCODINGS), default="auto", help="Secret serialization: auto (smallest of file/zlib, default), file, zlib, lzma or raw RGBA.")
+    save_parser.add_argument("--bits-per-channel", type=int, choices=range(1, MAX_BITS_PER_CHANNEL + 1), default=1, help="Low bits used per channel for the payload (default: 1).")
+    save_parser.add_argument("--alpha", action="store_true", help="Also embed into the alpha channel (RGBA covers only).")
+    save_parser.add_argument("--kdf", choices=sorted(KDFS), default="scrypt", help="Password KDF for new images: scrypt (default) or pbkdf2.")
+    save_parser.add_argument("--scatter", action="store_true", help="Spread the payload over keyed pseudo-random pixel positions (not with --stream).")
+    save_parser.add_argument("--stream", action="store_true", help="Process a PNG cover in horizontal strips instead of loading it whole.")
+    save_parser.add_argument("--strip-rows", type=int, default=STRIP_ROWS, help=f"Rows per strip in --stream mode (default: {STRIP_ROWS}).")
+    save_parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default="balanced", help="Output compression profile (default: balanced). The format follows the output extension: .png, .webp, .tif/.tiff or .bmp.")
+    save_parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes for several covers (default: CPU count).")
+    save_parser.add_argument("--threads", type=int, default=1, help="Deflate PNG output on this many threads (default: 1, Pillow's encoder).")
+    save_parser.add_argument("--password-fd", type=int, default=None, help="Read the key password from this file descriptor instead of prompting.")
+    save_parser.add_argument("--password-env", default=None, help="Read the key password from this environment variable, e.g. STEGO_PASSWORD.")
+    save_parser.add_argument("--trace", help="Write per-stage wall/CPU time, bytes and peak memory to this Chrome trace JSON file.")
 
     # Retrieve command
     retrieve_parser = subparsers.add_parser("retrieve", help="Retrieve an embedded image from a stego image.")
-    retrieve_parser.add_argument("-i", "--input", required=True, help="Path to the stego image.")
+    retrieve_parser.add_argument("-i", "--input", required=True, nargs="+", help="Path to the stego image, or every shard image of a split payload (any order).")
+    retrieve_parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes for several shard images (default: CPU count).")
     retrieve_parser.add_argument("-o", "--output", required=True, help="Output path for extracted image.")
+    retrieve_parser.add_argument("--password-fd", type=int, default=None, help="Read the key password from this file descriptor instead of prompting.")
+    retrieve_parser.add_argument("--password-env", default=None, help="Read the key password from this environment variable, e.g. STEGO_PASSWORD.")
+    retrieve_parser.add_argument("--trace", help="Write per-stage wall/CPU time, bytes and peak memory to this Chrome trace JSON file.")
+
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Run save or retrieve over a CSV/JSONL manifest in parallel.")
+    batch_parser.add_argument("action", choices=["save", "retrieve"], help="Operation applied to every manifest row.")
+    batch_parser.add_argument("-m", "--manifest", required=True, help="CSV (with header) or .jsonl manifest; save rows need cover, payload (secret image), output; retrieve rows need stego, output.")
+    batch_parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    batch_parser.add_argument("--cipher", choices=sorted(CIPHERS), default="gcm", help="AES-256 mode for save: gcm (default) or ctr.")
+    batch_parser.add_argument("--kdf", choices=sorted(KDFS), default="scrypt", help="Password KDF for new images: scrypt (default) or pbkdf2.")
+    batch_parser.add_argument("--password-fd", type=int, default=None, help="Read the key password from this file descriptor.")
+    batch_parser.add_argument("--password-env", default=None, help="Read the key password from this environment variable, e.g. STEGO_PASSWORD.")
+    batch_parser.add_argument("--trace", help="Trace every job and write all events to this Chrome trace JSON file.")
 
     args = parser.parse_args()
 
     if args.command == "save":
         try:
-            # Load images
-            cover_image = Image.open(args.input).convert("RGBA")
-            secret_image = Image.open(args.secret).convert("RGBA")
-            pixels = cover_image.load()
-            
-            # Convert secret image to bytes
-            secret_bytes = image_to_bytes(secret_image)
-            
-            # Get password
-            password = input("Enter the key password: ")
-            confirm_password = input("Confirm the key password: ")
-            if password != confirm_password:
-                print("Error: Passwords do not match.")
-                sys.exit(1)
-
-            # Generate key and encrypt
-            key = generate_key(password)
-            encrypted_secret = xor_encrypt(secret_bytes, key)
-
-            # Check capacity
-            width, height = cover_image.size
-            available_bits = width * height * 3
-            if len(encrypted_secret) * 8 > available_bits:
-                print("Error: Secret image is too large to fit into the cover image.")
-                sys.exit(1)
-
-            # Embed encrypted secret in cover image
-            embed_message_in_image(pixels, width, height, encrypted_secret)
-
-            # Save stego image
-            cover_image.save(args.output, "PNG")
-            print(f"Output image '{args.output}' saved with success.")
+            # Prompt for password and confirm it
+            password = read_password(args.password_fd, args.password_env, confirm=True)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        try:
+            # Derive the key, encrypt and embed
+            tracer = StageTracer() if args.trace else None
+            if len(args.input) > 1 or len(args.output) > 1:
+                if args.stream:
+                    raise ValueError("Streaming works on a single cover.")
+                reports = hide_image_shards(args.input, args.secret, args.output, password, cipher_id=CIPHERS[args.cipher],
+                                            bits_per_channel=args.bits_per_channel, use_alpha=args.alpha, encoding=args.encoding,
+                                            kdf_id=KDFS[args.kdf], scatter=args.scatter, profile=args.profile, threads=args.threads,
+                                            workers=args.workers, tracer=tracer)
+            else:
+                reports = [hide_image(args.input[0], args.secret, args.output[0], password, cipher_id=CIPHERS[args.cipher],
+                                      stream=args.stream, strip_rows=args.strip_rows, bits_per_channel=args.bits_per_channel,
+                                      use_alpha=args.alpha, encoding=args.encoding, kdf_id=KDFS[args.kdf], scatter=args.scatter,
+                                      profile=args.profile, threads=args.threads, tracer=tracer)]
+            for output, report in zip(args.output, reports):
+                print(f"Output image '{output}' saved with success.")
+                print(f"Encoded {report.format} with the {report.profile} profile in {report.seconds:.2f} s ({report.size} bytes).")
+            if tracer:
+                tracer.save(args.trace)
 
         except Exception as e:
             print(f"Error during embedding: {str(e)}")
@@ -130,39 +315,38 @@ def main():
 
     elif args.command == "retrieve":
         try:
-            # Load stego image
-            stego_image = Image.open(args.input).convert("RGBA")
-            pixels = stego_image.load()
-            width, height = stego_image.size
-
-            # Get password
-            password = input("Enter the key password: ")
-            key = generate_key(password)
-
-            # Extract header (first 4 bytes) to get dimensions
-            header_data = extract_message_from_image(pixels, width, height, 4)
-            secret_width = int.from_bytes(header_data[:2], 'big')
-            secret_height = int.from_bytes(header_data[2:4], 'big')
-
-            # Calculate total size of secret image data
-            total_bytes = 4 + (secret_width * secret_height * 4)  # header + RGBA pixels
-
-            # Extract and decrypt the full message
-            encrypted_data = extract_message_from_image(pixels, width, height, total_bytes)
-            decrypted_data = xor_encrypt(encrypted_data, key)
-
-            try:
-                # Convert decrypted data back to image
-                secret_image = bytes_to_image(decrypted_data)
-                secret_image.save(args.output)
-                print(f"Successfully extracted hidden image to {args.output}")
-            except Exception as e:
-                print("Error: Invalid password or corrupted data")
-                sys.exit(1)
+            # Prompt for password
+            password = read_password(args.password_fd, args.password_env)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        try:
+            tracer = StageTracer() if args.trace else None
+            if len(args.input) > 1:
+                reveal_image_shards(args.input, args.output, password, args.workers, tracer=tracer)
+            else:
+                reveal_image(args.input[0], args.output, password, tracer=tracer)
+            print(f"Successfully extracted hidden image to {args.output}")
+            if tracer:
+                tracer.save(args.trace)
 
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
         except Exception as e:
             print(f"Error during extraction: {str(e)}")
             sys.exit(1)
 
+    elif args.command == "batch":
+        try:
+            password = read_password(args.password_fd, args.password_env)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        failures = run_batch(run_batch_job, args.manifest, args.action, password, cipher_id=CIPHERS[args.cipher],
+                             workers=args.workers, kdf_id=KDFS[args.kdf], trace_path=args.trace)
+        sys.exit(1 if failures else 0)
+
 if __name__ == "__main__":
     main()
@@ -1,22 +1,20 @@
 """-------------------------------------By: Damodhar Pai------------------------------------------------"""
 import argparse
+import hmac
+import json
+import os
+import struct
 import sys
+import zlib
+from cryptography.exceptions import InvalidTag
 from PIL import Image
 
-def generate_key(password, length=32):
-    """Generates a 256-bit (32-byte) key by repeating or truncating the password."""
-    password = password.encode()  # Ensure password is in bytes
-    return (password * (length // len(password) + 1))[:length]  # Repeat or truncate to 32 bytes
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # stego_core and stage_trace live at the repository root
+from stage_trace import StageTracer, trace_stage, traced
+from stego_core import *  # the shared engine, re-exported for callers that load this script as a module
 
-def xor_encrypt(data, key):
-    """Encrypts data using XOR with a 256-bit key."""
-    return bytearray(d ^ key[i % len(key)] for i, d in enumerate(data))
-
-def pad_message(message, block_size=16):
-    """Pad the message to a multiple of block_size bytes."""
-    padding_length = block_size - (len(message) % block_size)
-    padding = bytes([padding_length] * padding_length)
-    return message + padding
+CONTAINER_CHUNK_SIZE = 1 << 16  # plaintext bytes per container chunk
+INDEX_MAC_LABEL = b"stego-index-mac"
 
 def unpad_message(padded_message):
     """Remove the padding from the message."""
@@ -27,52 +25,329 @@ def unpad_message(padded_message):
         raise ValueError("Invalid padding")
     return padded_message[:-padding_length]
 
-def embed_message_in_image(pixels, width, height, message_bytes):
-    """Embeds byte-aligned message data into the LSBs of an image's RGB channels."""
-    data_index = 0
-    for y in range(height):
-        for x in range(width):
-            if data_index >= len(message_bytes) * 8:  # Stop when message is fully embedded
-                return
-            r, g, b, a = pixels[x, y]
-            if data_index < len(message_bytes) * 8:
-                r = (r & 0xFE) | ((message_bytes[data_index // 8] >> (7 - (data_index % 8))) & 1)
-                data_index += 1
-            if data_index < len(message_bytes) * 8:
-                g = (g & 0xFE) | ((message_bytes[data_index // 8] >> (7 - (data_index % 8))) & 1)
-                data_index += 1
-            if data_index < len(message_bytes) * 8:
-                b = (b & 0xFE) | ((message_bytes[data_index // 8] >> (7 - (data_index % 8))) & 1)
-                data_index += 1
-            pixels[x, y] = (r, g, b, a)
-
-def extract_message_from_image(pixels, width, height, num_bytes):
-    """Extracts byte-aligned message data from the LSBs of an image's RGB channels."""
-    bits = []
-    data_index = 0
-    for y in range(height):
-        for x in range(width):
-            if data_index >= num_bytes * 8:
+TAG = "SECRET:"  # Known tag for verification
+
+@traced("hide_message")
+def hide_message(cover_path, message, output_path, password, *, cipher_id=CIPHER_GCM, stream=False, strip_rows=STRIP_ROWS,
+                 bits_per_channel=1, use_alpha=False, kdf_id=KDF_SCRYPT, salt=None, scatter=False, profile="balanced", threads=1):
+    """Encrypts message, embeds it into the cover image and saves the stego image.
+
+    bits_per_channel and use_alpha choose the body's bit layout (recorded in
+    the header). The key is derived from password with kdf_id and salt (a
+    fresh random salt by default). With stream=True the cover must be a PNG
+    and is processed in strips of strip_rows rows instead of being loaded whole.
+    With scatter=True the body goes to key-dependent pseudo-random positions.
+    profile and threads control the output encoder (see save_stego_image);
+    returns an EncodeReport (for streaming, its time covers the whole pass).
+    tracer (a StageTracer) records the time and memory of each stage.
+    """
+    if scatter and stream:
+        raise ValueError("Scatter mode cannot be combined with streaming.")
+    # Encrypt the tagged message with AES-256 and wrap it in an authenticated header
+    flags = (FLAG_ALPHA if use_alpha else 0) | (FLAG_SCATTER if scatter else 0)
+    message_bytes, key = pack_envelope((TAG + message).encode(), password, cipher_id, ENCODING_TEXT, bits_per_channel, flags, kdf_id, salt)
+    return embed_envelope_in_cover(cover_path, output_path, message_bytes, key, stream=stream, strip_rows=strip_rows,
+                                   bits_per_channel=bits_per_channel, use_alpha=use_alpha, scatter=scatter, profile=profile,
+                                   threads=threads,
+                                   too_large="Message is too large to fit into the cover image; pass several covers to split it.")
+
+@traced("reveal_message")
+def reveal_message(stego_path, password):
+    """Extracts and decrypts the message from a stego image; raises ValueError on a wrong password.
+
+    PNG rows are decoded only up to the last one holding the payload.
+    tracer (a StageTracer) records the time and memory of each stage.
+    """
+    stego = StegoPixels(stego_path)
+    pixels = stego.pixels
+
+    # Read magic and version once; images without the magic hold legacy XOR data
+    height, width = pixels.shape[:2]
+    capacity = capacity_bytes(width, height)
+    reader = LSBReader(pixels)
+
+    try:
+        stego.ensure(BODY_START_PIXEL)  # covers the prefix and the whole header
+        prefix = reader.read(PREFIX_SIZE)
+        if prefix[:len(MAGIC)] != MAGIC:
+            # Legacy layout: 4-byte length followed by the XOR-encrypted padded message
+            message_length = int.from_bytes(prefix[:4], byteorder='big')
+            if message_length > capacity - 4:
+                raise ValueError("Message length exceeds image capacity")
+            stego.ensure(-(-(4 + message_length) * 8 // 3))
+            with trace_stage("extract", message_length):
+                encrypted_message = reader.read(message_length)
+            with trace_stage("xor_decrypt", message_length):
+                plaintext = unpad_message(xor_encrypt(encrypted_message, legacy_key(password)))
+        else:
+            # Header is verified before a single body bit is read
+            header, key = unpack_header(prefix + reader.read(HEADER_SIZE - PREFIX_SIZE), password, width, height)
+            if header.flags & FLAG_SHARD:
+                raise ShardError("This image holds one shard of a split payload; retrieve it together with the other shard images.")
+            if header.encoding == ENCODING_CONTAINER:
+                raise PayloadKindError("This image holds files; list them with --list or extract one with -o <file> [--entry <name>].")
+            if header.encoding != ENCODING_TEXT:
+                raise PayloadKindError(f"This image holds {payload_kind(header.encoding)}, not a text message.")
+            stego.ensure(body_end_pixel(header, width, height))
+            with trace_stage("extract", header.body_length):
+                encrypted_message = body_reader(pixels, header, reader, key).read(header.body_length)
+            with trace_stage("decrypt", header.body_length):
+                plaintext = aes_decrypt(encrypted_message, key, header.cipher_id, header.nonce)
+        # Check for the tag before any further processing
+        if not plaintext.startswith(TAG.encode()):
+            raise ValueError("Missing tag")
+        return plaintext.decode('utf-8', errors='strict')[len(TAG):]
+    except (ShardError, PayloadKindError):
+        raise
+    except (InvalidTag, ValueError, IndexError):
+        raise ValueError("Invalid password.") from None
+    finally:
+        stego.close()
+
+@traced("hide_message_shards")
+def hide_message_shards(cover_paths, message, output_paths, password, *, cipher_id=CIPHER_GCM, bits_per_channel=1, use_alpha=False,
+                        kdf_id=KDF_SCRYPT, salt=None, scatter=False, profile="balanced", threads=1, workers=None):
+    """Encrypts message and spreads it over several covers in parallel (see embed_shards).
+
+    Returns the EncodeReport of every output.
+    """
+    return embed_shards(cover_paths, output_paths, (TAG + message).encode(), password, cipher_id=cipher_id, encoding=ENCODING_TEXT,
+                        bits_per_channel=bits_per_channel, use_alpha=use_alpha, kdf_id=kdf_id, salt=salt, scatter=scatter,
+                        profile=profile, threads=threads, workers=workers)
+
+@traced("reveal_message_shards")
+def reveal_message_shards(stego_paths, password, workers=None):
+    """Reassembles and decrypts a message split over shard images, given in any order.
+
+    Raises ShardError for missing, duplicate or foreign shards and ValueError on a wrong password.
+    """
+    try:
+        header, plaintext = extract_shards(stego_paths, password, workers)
+        if header.encoding != ENCODING_TEXT:
+            raise PayloadKindError(f"These shards hold {payload_kind(header.encoding)}, not a text message.")
+        if not plaintext.startswith(TAG.encode()):
+            raise ValueError("Missing tag")
+        return plaintext.decode('utf-8', errors='strict')[len(TAG):]
+    except (ShardError, PayloadKindError):
+        raise
+    except (InvalidTag, ValueError, IndexError):
+        raise ValueError("Invalid password.") from None
+
+def _chunk_nonce(nonce, number):
+    """Nonce of container chunk number (0 is the index): the header nonce's first 8 bytes and a 32-bit counter."""
+    return nonce[:8] + struct.pack(">I", number)
+
+def open_input(path):
+    """(entry name, binary stream) for a file path, or for stdin when path is "-"."""
+    if path == "-":
+        return "stdin", sys.stdin.buffer
+    return os.path.basename(path), open(path, "rb")
+
+def pack_container(entries, password, cipher_id=CIPHER_GCM, bits_per_channel=1, flags=0, kdf_id=KDF_SCRYPT, salt=None, capacity=None):
+    """Builds a container envelope from (name, binary stream) entries.
+
+    Each stream is read CONTAINER_CHUNK_SIZE bytes at a time and every chunk
+    is encrypted with its own nonce as soon as it is read, so only ciphertext
+    accumulates and reading stops as soon as capacity bytes are exceeded. The
+    body is the encrypted JSON index (its length first, a MAC after it) and
+    then the chunks; the index lists every entry's size and first chunk and
+    every chunk's ciphertext length and CRC-32. Returns (envelope, key).
+    """
+    salt = salt or os.urandom(SALT_SIZE)
+    cost = DEFAULT_KDF_COST[kdf_id]
+    key = derive_key(password, salt, kdf_id, cost)
+    nonce = os.urandom(NONCE_SIZE)
+    index = {"entries": [], "chunks": []}
+    chunks = []
+    total = 0
+    for name, stream in entries:
+        if any(entry["name"] == name for entry in index["entries"]):
+            raise ValueError(f"Two inputs are named '{name}'.")
+        entry = {"name": name, "size": 0, "first_chunk": len(chunks), "chunks": 0}
+        while True:
+            data = stream.read(CONTAINER_CHUNK_SIZE)
+            if not data:
+                break
+            with trace_stage("encrypt", len(data)):
+                _, chunk = aes_encrypt(data, key, cipher_id, _chunk_nonce(nonce, len(chunks) + 1))
+            total += len(chunk)
+            if capacity is not None and total > capacity:
+                raise ValueError("Files are too large to fit into the cover image.")
+            chunks.append(chunk)
+            index["chunks"].append([len(chunk), zlib.crc32(chunk)])
+            entry["size"] += len(data)
+            entry["chunks"] += 1
+        index["entries"].append(entry)
+
+    _, index_block = aes_encrypt(json.dumps(index, separators=(",", ":")).encode(), key, cipher_id, _chunk_nonce(nonce, 0))
+    index_block = struct.pack(">I", len(index_block)) + index_block
+    body = [index_block, record_mac(key, INDEX_MAC_LABEL, index_block)] + chunks
+    body_length = sum(len(part) for part in body)
+    if capacity is not None and body_length > capacity:
+        raise ValueError("Files are too large to fit into the cover image.")
+    header = Header(cipher_id, ENCODING_CONTAINER, bits_per_channel, flags, kdf_id, cost, salt, nonce, body_length)
+    return b"".join([pack_header(key, header)] + body), key
+
+class Container:
+    """Random access to the chunked container in a stego image's body.
+
+    The index is read and verified on construction. read() locates the bit
+    offsets of the chunks covering a byte range of one entry, decodes PNG
+    rows only as far as the last of them and decrypts just those chunks.
+    """
+
+    def __init__(self, stego, header, key, body):
+        self.stego, self.header, self.key, self.body = stego, header, key, body
+        self.origin = body.bit_position
+        length_field = self._read(0, 4)
+        index_length = struct.unpack(">I", length_field)[0]
+        if 4 + index_length + HEADER_MAC_SIZE > header.body_length:
+            raise ValueError("Corrupted container index")
+        index_block = self._read(4, index_length)
+        if not hmac.compare_digest(bytes(self._read(4 + index_length, HEADER_MAC_SIZE)), record_mac(key, INDEX_MAC_LABEL, bytes(length_field + index_block))):
+            raise ValueError("Corrupted container index")
+        self.index = json.loads(aes_decrypt(index_block, key, header.cipher_id, _chunk_nonce(header.nonce, 0)))
+
+        tag_size = GCM_TAG_SIZE if header.cipher_id == CIPHER_GCM else 0
+        self.offsets = [4 + index_length + HEADER_MAC_SIZE]
+        for length, _ in self.index["chunks"]:
+            self.offsets.append(self.offsets[-1] + length)
+        if self.offsets[-1] > header.body_length:
+            raise ValueError("Corrupted container index")
+        self.plain_sizes = [length - tag_size for length, _ in self.index["chunks"]]
+
+    def _read(self, offset, length):
+        """Reads length body bytes at offset after decoding the rows that hold them."""
+        end_pixel = body_end_pixel(self.header._replace(body_length=offset + length), self.stego.width, self.stego.height)
+        self.stego.ensure(end_pixel)
+        self.body.bit_position = self.origin + offset * 8
+        return self.body.read(length)
+
+    def entry(self, name=None):
+        """Index entry called name; without a name the only entry, if there is just one."""
+        entries = self.index["entries"]
+        if name is None:
+            if len(entries) != 1:
+                raise PayloadKindError(f"The image holds {len(entries)} files; choose one with --entry: {', '.join(e['name'] for e in entries)}")
+            return entries[0]
+        for entry in entries:
+            if entry["name"] == name:
+                return entry
+        raise PayloadKindError(f"No file named '{name}' in the image.")
+
+    def read(self, entry, start=0, end=None):
+        """Bytes start:end of an entry, decrypting only the chunks that hold them."""
+        end = entry["size"] if end is None else min(end, entry["size"])
+        pieces = []
+        position = 0  # entry offset of the current chunk's first byte
+        for number in range(entry["first_chunk"], entry["first_chunk"] + entry["chunks"]):
+            size = self.plain_sizes[number]
+            if position >= end:
                 break
-            r, g, b, a = pixels[x, y]
-            bits.append((r & 1))
-            data_index += 1
-            if data_index < num_bytes * 8:
-                bits.append((g & 1))
-                data_index += 1
-            if data_index < num_bytes * 8:
-                bits.append((b & 1))
-                data_index += 1
-
-    # Convert extracted bits to bytes
-    message_bytes = bytearray()
-    for i in range(0, len(bits), 8):
-        byte = 0
-        for bit in bits[i:i+8]:
-            byte = (byte << 1) | bit
-        message_bytes.append(byte)
-
-    return message_bytes
+            if position + size > start:
+                length, checksum = self.index["chunks"][number]
+                with trace_stage("extract", length):
+                    chunk = self._read(self.offsets[number], length)
+                if zlib.crc32(chunk) != checksum:
+                    raise ValueError(f"Chunk {number} of the container is corrupted")
+                with trace_stage("decrypt", length):
+                    plaintext = aes_decrypt(chunk, self.key, self.header.cipher_id, _chunk_nonce(self.header.nonce, number + 1))
+                pieces.append(bytes(plaintext[max(0, start - position):end - position]))
+            position += size
+        return b"".join(pieces)
+
+@traced("hide_files")
+def hide_files(cover_path, paths, output_path, password, *, cipher_id=CIPHER_GCM, stream=False, strip_rows=STRIP_ROWS,
+               bits_per_channel=1, use_alpha=False, kdf_id=KDF_SCRYPT, salt=None, scatter=False, profile="balanced", threads=1):
+    """Embeds files ("-" reads stdin) as a seekable container of encrypted chunks; returns an EncodeReport.
+
+    The options are those of hide_message. Inputs are streamed and checked
+    against the cover's capacity while they are read.
+    """
+    if scatter and stream:
+        raise ValueError("Scatter mode cannot be combined with streaming.")
+    with Image.open(cover_path) as image:
+        width, height = image.size
+    flags = (FLAG_ALPHA if use_alpha else 0) | (FLAG_SCATTER if scatter else 0)
+    entries = [open_input(path) for path in paths]
+    try:
+        capacity = body_capacity(width, height, bits_per_channel, use_alpha, scatter)
+        envelope, key = pack_container(entries, password, cipher_id, bits_per_channel, flags, kdf_id, salt, capacity)
+    finally:
+        for _, handle in entries:
+            if handle is not sys.stdin.buffer:
+                handle.close()
+    return embed_envelope_in_cover(cover_path, output_path, envelope, key, stream=stream, strip_rows=strip_rows,
+                                   bits_per_channel=bits_per_channel, use_alpha=use_alpha, scatter=scatter, profile=profile,
+                                   threads=threads,
+                                   too_large="Files are too large to fit into the cover image.")
+
+def _with_container(stego_path, password, action):
+    """Opens the container in a stego image, returns action(container) and closes the image."""
+    stego = StegoPixels(stego_path)
+    try:
+        height, width = stego.pixels.shape[:2]
+        reader = LSBReader(stego.pixels)
+        stego.ensure(BODY_START_PIXEL)
+        header, key = unpack_header(reader.read(HEADER_SIZE), password, width, height)
+        if header.encoding == ENCODING_TEXT:
+            raise PayloadKindError("This image holds a message, not files; retrieve it without --entry, --range, --list or -o.")
+        if header.encoding != ENCODING_CONTAINER:
+            raise PayloadKindError(f"This image holds {payload_kind(header.encoding)}, not files.")
+        return action(Container(stego, header, key, body_reader(stego.pixels, header, reader, key)))
+    except (PayloadKindError, ShardError):
+        raise
+    except (InvalidTag, ValueError, IndexError):
+        raise ValueError("Invalid password or corrupted data.") from None
+    finally:
+        stego.close()
+
+@traced("list_files")
+def list_files(stego_path, password):
+    """(name, size) of every file in a container image; only the index is decoded."""
+    return _with_container(stego_path, password, lambda container: [(entry["name"], entry["size"]) for entry in container.index["entries"]])
+
+@traced("reveal_file")
+def reveal_file(stego_path, password, name=None, start=0, end=None):
+    """Bytes start:end of one file in a container image (the only one when name is None).
+
+    Only the chunks covering the range are read and decrypted, and PNG rows
+    past the last of them are never decoded.
+    """
+    return _with_container(stego_path, password, lambda container: container.read(container.entry(name), start, end))
+
+def parse_range(text):
+    """Turns "START:END" (either side may be empty) into (start, end or None)."""
+    start, separator, end = text.partition(":")
+    if not separator:
+        raise argparse.ArgumentTypeError("use START:END, e.g. 0:4096 or 1048576:")
+    try:
+        start, end = int(start or 0), (int(end) if end else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError("START and END must be byte offsets") from None
+    if start < 0 or (end is not None and end < start):
+        raise argparse.ArgumentTypeError("need 0 <= START <= END")
+    return start, end
+
+def run_batch_job(job):
+    """Runs one manifest row in a worker process and returns (row, error or None, result, trace events or None)."""
+    row, action, entry, password, cipher_id, kdf_id, salt, trace = job
+    tracer = StageTracer() if trace else None
+    try:
+        if action == "save":
+            hide_message(entry["cover"], entry["payload"], entry["output"], password,
+                         cipher_id=cipher_id, kdf_id=kdf_id, salt=salt, tracer=tracer)
+            return row, None, entry["output"], tracer and tracer.events
+        message = reveal_message(entry["stego"], password, tracer=tracer)
+        if entry.get("output"):
+            with open(entry["output"], "w", encoding="utf-8") as f:
+                f.write(message)
+            return row, None, entry["output"], tracer and tracer.events
+        return row, None, message, tracer and tracer.events
+    except KeyError as e:
+        return row, f"Missing manifest column {e}", None, tracer and tracer.events
+    except Exception as e:
+        return row, str(e), None, tracer and tracer.events
 
 def main():
     parser = argparse.ArgumentParser(description="Embed or retrieve a message in an image using LSB steganography.")
@@ -80,99 +355,137 @@ def main():
 
     # Sub-parser for the "save" command
     save_parser = subparsers.add_parser("save", help="Embed a message in an image.")
-    save_parser.add_argument("-i", "--input", required=True, help="Path to the cover image.")
-    save_parser.add_argument("-m", "--message", required=True, help="Secret message to embed.")
-    save_parser.add_argument("-o", "--output", required=True, help="Output path for the stego image.")
+    save_parser.add_argument("-i", "--input", required=True, nargs="+", help="Path to the cover image; several covers split the payload into shards.")
+    payload_group = save_parser.add_mutually_exclusive_group(required=True)
+    payload_group.add_argument("-m", "--message", help="Secret message to embed.")
+    payload_group.add_argument("-f", "--file", nargs="+", help="Files to embed as a seekable container; '-' streams stdin (give the password with --password-fd or --password-env, default STEGO_PASSWORD).")
+    save_parser.add_argument("-o", "--output", required=True, nargs="+", help="Output path for the stego image (one per cover).")
+    save_parser.add_argument("--cipher", choices=sorted(CIPHERS), default="gcm", help="AES-256 mode: gcm (authenticated, default) or ctr.")
+    save_parser.add_argument("--bits-per-channel", type=int, choices=range(1, MAX_BITS_PER_CHANNEL + 1), default=1, help="Low bits used per channel for the payload (default: 1).")
+    save_parser.add_argument("--alpha", action="store_true", help="Also embed into the alpha channel (RGBA covers only).")
+    save_parser.add_argument("--kdf", choices=sorted(KDFS), default="scrypt", help="Password KDF for new images: scrypt (default) or pbkdf2.")
+    save_parser.add_argument("--scatter", action="store_true", help="Spread the payload over keyed pseudo-random pixel positions (not with --stream).")
+    save_parser.add_argument("--stream", action="store_true", help="Process a PNG cover in horizontal strips instead of loading it whole.")
+    save_parser.add_argument("--strip-rows", type=int, default=STRIP_ROWS, help=f"Rows per strip in --stream mode (default: {STRIP_ROWS}).")
+    save_parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default="balanced", help="Output compression profile (default: balanced). The format follows the output extension: .png, .webp, .tif/.tiff or .bmp.")
+    save_parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes for several covers (default: CPU count).")
+    save_parser.add_argument("--password-fd", type=int, default=None, help="Read the key password from this file descriptor instead of prompting.")
+    save_parser.add_argument("--password-env", default=None, help="Read the key password from this environment variable, e.g. STEGO_PASSWORD (used by default when stdin carries a file).")
+    save_parser.add_argument("--threads", type=int, default=1, help="Deflate PNG output on this many threads (default: 1, Pillow's encoder).")
+    save_parser.add_argument("--trace", help="Write per-stage wall/CPU time, bytes and peak memory to this Chrome trace JSON file.")
 
     # Sub-parser for the "retrieve" command
     retrieve_parser = subparsers.add_parser("retrieve", help="Retrieve a message from a stego image.")
-    retrieve_parser.add_argument("-i", "--input", required=True, help="Path to the stego image.")
+    retrieve_parser.add_argument("-i", "--input", required=True, nargs="+", help="Path to the stego image, or every shard image of a split payload (any order).")
+    retrieve_parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes for several shard images (default: CPU count).")
+    retrieve_parser.add_argument("-o", "--output", help="Write a file from a container image here.")
+    retrieve_parser.add_argument("--entry", help="Name of the file to extract from a container image (default: its only file).")
+    retrieve_parser.add_argument("--range", type=parse_range, help="Extract only bytes START:END of the file; only the chunks holding them are decrypted.")
+    retrieve_parser.add_argument("--list", action="store_true", help="List the files in a container image.")
+    retrieve_parser.add_argument("--password-fd", type=int, default=None, help="Read the key password from this file descriptor instead of prompting.")
+    retrieve_parser.add_argument("--password-env", default=None, help="Read the key password from this environment variable, e.g. STEGO_PASSWORD.")
+    retrieve_parser.add_argument("--trace", help="Write per-stage wall/CPU time, bytes and peak memory to this Chrome trace JSON file.")
 
-    args = parser.parse_args()
+    # Sub-parser for the "batch" command
+    batch_parser = subparsers.add_parser("batch", help="Run save or retrieve over a CSV/JSONL manifest in parallel.")
+    batch_parser.add_argument("action", choices=["save", "retrieve"], help="Operation applied to every manifest row.")
+    batch_parser.add_argument("-m", "--manifest", required=True, help="CSV (with header) or .jsonl manifest; save rows need cover, payload, output; retrieve rows need stego and optionally output.")
+    batch_parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    batch_parser.add_argument("--cipher", choices=sorted(CIPHERS), default="gcm", help="AES-256 mode for save: gcm (default) or ctr.")
+    batch_parser.add_argument("--kdf", choices=sorted(KDFS), default="scrypt", help="Password KDF for new images: scrypt (default) or pbkdf2.")
+    batch_parser.add_argument("--password-fd", type=int, default=None, help="Read the key password from this file descriptor.")
+    batch_parser.add_argument("--password-env", default=None, help="Read the key password from this environment variable, e.g. STEGO_PASSWORD.")
+    batch_parser.add_argument("--trace", help="Trace every job and write all events to this Chrome trace JSON file.")
 
-    TAG = "SECRET:"  # Known tag for verification
+    args = parser.parse_args()
 
     if args.command == "save":
-        # Embedding Process
-        input_image_path = args.input
-        message = TAG + args.message
-        output_image_path = args.output
+        tracer = StageTracer() if args.trace else None
+        password_env = args.password_env
+        if args.password_fd is None and password_env is None and args.file and "-" in args.file:
+            password_env = "STEGO_PASSWORD"  # stdin carries the file, so it cannot carry the password
+        try:
+            # Prompt for password and confirm it
+            password = read_password(args.password_fd, password_env, confirm=True)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
 
-        # Open cover image
         try:
-            cover_image = Image.open(input_image_path)
-            cover_image = cover_image.convert("RGBA")
-            pixels = cover_image.load()
+            if args.file:
+                if len(args.input) > 1 or len(args.output) > 1:
+                    raise ValueError("Files go into a single cover; split a message over several covers instead.")
+                reports = [hide_files(args.input[0], args.file, args.output[0], password, cipher_id=CIPHERS[args.cipher],
+                                      stream=args.stream, strip_rows=args.strip_rows, bits_per_channel=args.bits_per_channel,
+                                      use_alpha=args.alpha, kdf_id=KDFS[args.kdf], scatter=args.scatter, profile=args.profile,
+                                      threads=args.threads, tracer=tracer)]
+            elif len(args.input) > 1 or len(args.output) > 1:
+                if args.stream:
+                    raise ValueError("Streaming works on a single cover.")
+                reports = hide_message_shards(args.input, args.message, args.output, password, cipher_id=CIPHERS[args.cipher],
+                                              bits_per_channel=args.bits_per_channel, use_alpha=args.alpha, kdf_id=KDFS[args.kdf],
+                                              scatter=args.scatter, profile=args.profile, threads=args.threads, workers=args.workers,
+                                              tracer=tracer)
+            else:
+                reports = [hide_message(args.input[0], args.message, args.output[0], password, cipher_id=CIPHERS[args.cipher],
+                                        stream=args.stream, strip_rows=args.strip_rows, bits_per_channel=args.bits_per_channel,
+                                        use_alpha=args.alpha, kdf_id=KDFS[args.kdf], scatter=args.scatter, profile=args.profile,
+                                        threads=args.threads, tracer=tracer)]
         except IOError:
             print("Error: Could not open cover image.")
             sys.exit(1)
-
-        # Prompt for password and confirm it
-        password = input("Enter the key password: ")
-        confirm_password = input("Confirm the key password: ")
-        if password != confirm_password:
-            print("Error: Passwords do not match.")
+        except ValueError as e:
+            print(f"Error: {e}")
             sys.exit(1)
-
-        # Generate a 256-bit key from the confirmed password
-        key = generate_key(password)
-
-        # Pad and encrypt the message
-        padded_message = pad_message(message.encode())
-        encrypted_message = xor_encrypt(padded_message, key)
-
-        # Convert message length to a fixed 4-byte format and prepend to message
-        message_length = len(encrypted_message)
-        length_bytes = message_length.to_bytes(4, byteorder='big')
-        message_bytes = length_bytes + encrypted_message
-
-        # Embed the message in the image
-        width, height = cover_image.size
-        embed_message_in_image(pixels, width, height, message_bytes)
-
-        # Save the stego image
-        cover_image.save(output_image_path, "PNG")
-        print(f"Output image '{output_image_path}' saved with success.")
+        for output, report in zip(args.output, reports):
+            print(f"Output image '{output}' saved with success.")
+            print(f"Encoded {report.format} with the {report.profile} profile in {report.seconds:.2f} s ({report.size} bytes).")
+        if tracer:
+            tracer.save(args.trace)
 
     elif args.command == "retrieve":
-        # Extraction Process
-        input_image_path = args.input
+        try:
+            # Prompt for password
+            password = read_password(args.password_fd, args.password_env)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        tracer = StageTracer() if args.trace else None
 
         try:
-            stego_image = Image.open(input_image_path)
-            stego_image = stego_image.convert("RGBA")
-            pixels = stego_image.load()
+            if args.list:
+                for name, size in list_files(args.input[0], password, tracer=tracer):
+                    print(f"{size:>12}  {name}")
+            elif args.output or args.entry or args.range:
+                if not args.output:
+                    raise ValueError("Give -o <file> to save the extracted file.")
+                start, end = args.range or (0, None)
+                data = reveal_file(args.input[0], password, args.entry, start, end, tracer=tracer)
+                with open(args.output, "wb") as f:
+                    f.write(data)
+                print(f"Extracted {len(data)} bytes to {args.output}")
+            elif len(args.input) > 1:
+                print("Decrypted message:", reveal_message_shards(args.input, password, args.workers, tracer=tracer))
+            else:
+                print("Decrypted message:", reveal_message(args.input[0], password, tracer=tracer))
         except IOError:
             print("Error: Could not open stego image.")
             sys.exit(1)
+        except ValueError as e:
+            print(str(e))
+            sys.exit(1)
+        if tracer:
+            tracer.save(args.trace)
 
-        # Prompt for password
-        password = input("Enter the key password: ")
-        key = generate_key(password)
-
-        # Extract message length (first 4 bytes)
-        width, height = stego_image.size
-        length_bytes = extract_message_from_image(pixels, width, height, 4)
-        message_length = int.from_bytes(length_bytes, byteorder='big')
-
-        # Extract the encrypted message based on the extracted length
-        encrypted_message = extract_message_from_image(pixels, width, height, message_length + 4)[4:]  # Skip length bytes
-        decrypted_bytes = xor_encrypt(encrypted_message, key)
-        
+    elif args.command == "batch":
         try:
-            unpadded_message = unpad_message(decrypted_bytes)
-            # Check for the tag before any further processing
-            if unpadded_message.startswith(TAG.encode()):
-                # Only decode if the tag is present
-                decrypted_message = unpadded_message.decode('utf-8', errors='strict')
-                actual_message = decrypted_message[len(TAG):]
-                print("Decrypted message:", actual_message)
-            else:
-                print("Invalid password.")
-                sys.exit(1)
-        except Exception:
-            print("Invalid password.")
+            password = read_password(args.password_fd, args.password_env)
+        except ValueError as e:
+            print(f"Error: {e}")
             sys.exit(1)
+        failures = run_batch(run_batch_job, args.manifest, args.action, password, cipher_id=CIPHERS[args.cipher],
+                             workers=args.workers, kdf_id=KDFS[args.kdf], trace_path=args.trace)
+        sys.exit(1 if failures else 0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+"""-------------------------------------Steganography Benchmark Suite: By Damodhar Pai------------------------------------------------"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from quality_metrics import calculate_mse_psnr
+from histogram_analysis import plot_image_histograms
+import stego_core
+
+DEFAULT_MEGAPIXELS = [1, 4, 16]
+DEFAULT_PAYLOADS = ["1k", "64k", "1m", "capacity"]
+SIZE_UNITS = {"k": 1024, "m": 1024 * 1024}
+XOR_LIMIT = 4 * 1024 * 1024  # the legacy XOR cipher is pure Python; larger payloads would dominate the run
+RESULTS_VERSION = 1
+
+def parse_payload_size(text, capacity):
+    """Turn '1k', '2m', '4096' or 'capacity' into a byte count no larger than capacity."""
+    text = text.strip().lower()
+    if text == "capacity":
+        return capacity
+    multiplier = SIZE_UNITS.get(text[-1], 1)
+    size = int(float(text.rstrip("km")) * multiplier)
+    return min(size, capacity)
+
+def synthetic_cover(megapixels, seed=0):
+    """Random-noise RGBA cover of roughly the given megapixels (square, opaque)."""
+    side = int((megapixels * 1_000_000) ** 0.5)
+    pixels = np.random.default_rng(seed).integers(0, 256, (side, side, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    return pixels
+
+def quiet(func, *args, **kwargs):
+    """Wrap a call to one of the reporting tools so its printed report is discarded."""
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+    return call
+
+def measure(func, repeat, trace_memory=True):
+    """Best wall-clock seconds over `repeat` calls, plus peak traced memory in MB of one extra call.
+
+    Timing runs are untraced because tracemalloc slows allocation-heavy code.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb
+
+def run_suite(megapixels_list, payload_specs, repeat=3, trace_memory=True, plot=False):
+    """Time every hot path for each synthetic cover size and payload size.
+
+    Returns a list of result dicts keyed by stage, megapixels and payload_bytes.
+    """
+    key = stego_core.derive_key("benchmark-password", os.urandom(stego_core.SALT_SIZE))
+    results = []
+
+    def record(stage, megapixels, payload_bytes, func):
+        seconds, peak_mb = measure(func, repeat, trace_memory)
+        result = {
+            "stage": stage,
+            "megapixels": megapixels,
+            "payload_bytes": payload_bytes,
+            "seconds": seconds,
+            "mb_per_s": payload_bytes / (1024 * 1024) / seconds if payload_bytes and seconds else None,
+            "peak_mb": peak_mb,
+        }
+        results.append(result)
+        peak = f"{peak_mb:9.1f} MB" if peak_mb is not None else f"{'-':>12}"
+        print(f"  {stage:<26} {megapixels:>5g} MP  {payload_bytes:>11} B  {seconds * 1000:10.2f} ms  {peak}")
+
+    print(f"\nBenchmark suite (best of {repeat}):")
+    print("-" * 78)
+    print(f"  {'Stage':<26} {'Cover':>8}  {'Payload':>13}  {'Time':>13}  {'Peak memory':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for megapixels in megapixels_list:
+            cover = synthetic_cover(megapixels)
+            height, width = cover.shape[:2]
+            capacity = stego_core.capacity_bytes(width, height)
+            cover_path = os.path.join(tmp, "cover.png")
+            stego_path = os.path.join(tmp, "stego.png")
+            Image.fromarray(cover, "RGBA").save(cover_path, compress_level=1)
+
+            payload_sizes = sorted({parse_payload_size(spec, capacity) for spec in payload_specs})
+            for payload_bytes in payload_sizes:
+                payload = os.urandom(payload_bytes)
+                if payload_bytes <= XOR_LIMIT:
+                    record("xor_encrypt", megapixels, payload_bytes, lambda: stego_core.xor_encrypt(payload, key))
+                record("aes_encrypt_gcm", megapixels, payload_bytes, lambda: stego_core.aes_encrypt(payload, key))
+
+                pixels = cover.copy()
+                record("embed_message_in_image", megapixels, payload_bytes, lambda: stego_core.embed_message_in_image(pixels, payload))
+                record("extract_message_from_image", megapixels, payload_bytes, lambda: stego_core.extract_message_from_image(pixels, payload_bytes))
+
+                Image.fromarray(pixels, "RGBA").save(stego_path, compress_level=1)
+                record("calculate_mse_psnr", megapixels, payload_bytes, quiet(calculate_mse_psnr, cover_path, stego_path))
+                record("plot_image_histograms", megapixels, payload_bytes,
+                       quiet(plot_image_histograms, cover_path, stego_path, os.path.join(tmp, "hist.png"), plot=plot))
+    print("-" * 78)
+    return results
+
+def save_results(results, path):
+    """Write results with enough environment details to judge whether two runs are comparable."""
+    document = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results saved to {path}")
+
+def compare_results(results, baseline_path, threshold):
+    """Compare results against a saved baseline and return the number of regressions.
+
+    A stage regresses when its time grows by more than `threshold` (a fraction)
+    for the same cover and payload size.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported baseline version {baseline.get('version')}")
+    reference = {(r["stage"], r["megapixels"], r["payload_bytes"]): r for r in baseline["results"]}
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (threshold {threshold:.0%}):")
+    print("-" * 78)
+    for result in results:
+        base = reference.get((result["stage"], result["megapixels"], result["payload_bytes"]))
+        if base is None:
+            continue
+        change = result["seconds"] / base["seconds"] - 1
+        if change > threshold:
+            status = "REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        print(f"  {result['stage']:<26} {result['megapixels']:>5g} MP  {result['payload_bytes']:>11} B  "
+              f"{base['seconds'] * 1000:9.2f} -> {result['seconds'] * 1000:9.2f} ms  {change:+7.1%}  {status}")
+    print("-" * 78)
+    print(f"{regressions} regression(s) over {threshold:.0%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embed, extract, cipher and metrics hot paths on synthetic covers")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=DEFAULT_MEGAPIXELS, help="Cover sizes in megapixels (default: 1 4 16)")
+    parser.add_argument("--payloads", nargs="+", default=DEFAULT_PAYLOADS, help="Payload sizes such as 1k, 2m or 'capacity' (default: 1k 64k 1m capacity)")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per stage (default: 3)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced run that measures peak memory")
+    parser.add_argument("--plot", action="store_true", help="Include rendering the histogram plot in plot_image_histograms")
+    parser.add_argument("-o", "--output", help="Save results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against; exits non-zero on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown fraction counted as a regression (default: 0.10)")
+
+    args = parser.parse_args()
+
+    try:
+        results = run_suite(args.megapixels, args.payloads, args.repeat, not args.no_memory, args.plot)
+        if args.output:
+            save_results(results, args.output)
+        if args.compare and compare_results(results, args.compare, args.threshold):
+            return 1
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
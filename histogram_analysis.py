@@ -1,11 +1,68 @@
 """-------------------------------------Damodhar Pai-----------------------------------------------"""
-import matplotlib.pyplot as plt
 from PIL import Image
 import argparse
 import sys
 
-def plot_image_histograms(cover_path, stego_path, output_path=None):
-    """Plot RGB histograms for both cover and stego images."""
+DEFAULT_OUTPUT = "histogram_comparison.png"
+
+def save_histogram_figure(cover_hists, stego_hists, output_path):
+    """Render the 2x3 RGB histogram comparison and save it to output_path."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    cover_r_hist, cover_g_hist, cover_b_hist = cover_hists
+    stego_r_hist, stego_g_hist, stego_b_hist = stego_hists
+
+    # Create subplot figure
+    fig, axs = plt.subplots(2, 3, figsize=(15, 10))
+    fig.suptitle('RGB Channel Histogram Comparison', fontsize=16)
+
+    # Plot cover image histograms
+    axs[0, 0].bar(range(256), cover_r_hist, color='red', alpha=0.7)
+    axs[0, 0].set_title('Cover Image - Red Channel')
+    axs[0, 0].set_xlim(0, 255)
+    axs[0, 0].set_ylabel('Frequency')
+
+    axs[0, 1].bar(range(256), cover_g_hist, color='green', alpha=0.7)
+    axs[0, 1].set_title('Cover Image - Green Channel')
+    axs[0, 1].set_xlim(0, 255)
+
+    axs[0, 2].bar(range(256), cover_b_hist, color='blue', alpha=0.7)
+    axs[0, 2].set_title('Cover Image - Blue Channel')
+    axs[0, 2].set_xlim(0, 255)
+
+    # Plot stego image histograms
+    axs[1, 0].bar(range(256), stego_r_hist, color='red', alpha=0.7)
+    axs[1, 0].set_title('Stego Image - Red Channel')
+    axs[1, 0].set_xlim(0, 255)
+    axs[1, 0].set_xlabel('Pixel Value')
+    axs[1, 0].set_ylabel('Frequency')
+
+    axs[1, 1].bar(range(256), stego_g_hist, color='green', alpha=0.7)
+    axs[1, 1].set_title('Stego Image - Green Channel')
+    axs[1, 1].set_xlim(0, 255)
+    axs[1, 1].set_xlabel('Pixel Value')
+
+    axs[1, 2].bar(range(256), stego_b_hist, color='blue', alpha=0.7)
+    axs[1, 2].set_title('Stego Image - Blue Channel')
+    axs[1, 2].set_xlim(0, 255)
+    axs[1, 2].set_xlabel('Pixel Value')
+
+    # Adjust layout
+    plt.tight_layout()
+
+    # Save the plot
+    plt.savefig(output_path)
+    plt.close(fig)
+    print(f"Histogram saved to {output_path}")
+
+def plot_image_histograms(cover_path, stego_path, output_path=None, plot=True):
+    """Plot RGB histograms for both cover and stego images.
+
+    matplotlib is only imported when plot is True, and always with the
+    non-interactive Agg backend so headless workers never block on a window.
+    """
     try:
         # Load images
         cover_image = Image.open(cover_path).convert('RGB')
@@ -24,51 +81,13 @@ def plot_image_histograms(cover_path, stego_path, output_path=None):
         stego_g_hist = stego_g.histogram()
         stego_b_hist = stego_b.histogram()
         
-        # Create subplot figure
-        fig, axs = plt.subplots(2, 3, figsize=(15, 10))
-        fig.suptitle('RGB Channel Histogram Comparison', fontsize=16)
-        
-        # Plot cover image histograms
-        axs[0, 0].bar(range(256), cover_r_hist, color='red', alpha=0.7)
-        axs[0, 0].set_title('Cover Image - Red Channel')
-        axs[0, 0].set_xlim(0, 255)
-        axs[0, 0].set_ylabel('Frequency')
-        
-        axs[0, 1].bar(range(256), cover_g_hist, color='green', alpha=0.7)
-        axs[0, 1].set_title('Cover Image - Green Channel')
-        axs[0, 1].set_xlim(0, 255)
-        
-        axs[0, 2].bar(range(256), cover_b_hist, color='blue', alpha=0.7)
-        axs[0, 2].set_title('Cover Image - Blue Channel')
-        axs[0, 2].set_xlim(0, 255)
-        
-        # Plot stego image histograms
-        axs[1, 0].bar(range(256), stego_r_hist, color='red', alpha=0.7)
-        axs[1, 0].set_title('Stego Image - Red Channel')
-        axs[1, 0].set_xlim(0, 255)
-        axs[1, 0].set_xlabel('Pixel Value')
-        axs[1, 0].set_ylabel('Frequency')
-        
-        axs[1, 1].bar(range(256), stego_g_hist, color='green', alpha=0.7)
-        axs[1, 1].set_title('Stego Image - Green Channel')
-        axs[1, 1].set_xlim(0, 255)
-        axs[1, 1].set_xlabel('Pixel Value')
-        
-        axs[1, 2].bar(range(256), stego_b_hist, color='blue', alpha=0.7)
-        axs[1, 2].set_title('Stego Image - Blue Channel')
-        axs[1, 2].set_xlim(0, 255)
-        axs[1, 2].set_xlabel('Pixel Value')
-        
-        # Adjust layout
-        plt.tight_layout()
-        
-        # Save or display the plot
-        if output_path:
-            plt.savefig(output_path)
-            print(f"Histogram saved to {output_path}")
-        else:
-            plt.show()
-        
+        if plot:
+            save_histogram_figure(
+                (cover_r_hist, cover_g_hist, cover_b_hist),
+                (stego_r_hist, stego_g_hist, stego_b_hist),
+                output_path or DEFAULT_OUTPUT,
+            )
+
         # Calculate and print statistical differences
         print("\nStatistical Analysis:")
         for channel, cover_hist, stego_hist, name in [
@@ -87,12 +106,13 @@ def main():
     parser = argparse.ArgumentParser(description="Generate histogram comparison for steganography images")
     parser.add_argument("-c", "--cover", required=True, help="Path to cover image")
     parser.add_argument("-s", "--stego", required=True, help="Path to stego image")
-    parser.add_argument("-o", "--output", help="Path to save histogram plot (optional)")
+    parser.add_argument("-o", "--output", help=f"Path to save histogram plot (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--no-plot", action="store_true", help="Only print the statistics; skip matplotlib entirely")
     
     args = parser.parse_args()
     
     try:
-        plot_image_histograms(args.cover, args.stego, args.output)
+        plot_image_histograms(args.cover, args.stego, args.output, plot=not args.no_plot)
     except Exception as e:
         print(f"Error: {str(e)}")
         return 1
@@ -3,38 +3,99 @@ import numpy as np
 from PIL import Image
 import math
 import argparse
+import csv
+import json
 import sys
+from stage_trace import StageTracer, trace_stage, traced
+from stego_core import load_manifest, run_jobs
 
-def calculate_mse_psnr(cover_path, stego_path):
+BLOCK_ROWS = 128  # rows compared per block; a multiple of SSIM_WINDOW so windows never straddle blocks
+SSIM_WINDOW = 8
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+RESULT_FIELDS = ["cover", "stego", "width", "height", "mse_r", "mse_g", "mse_b", "mse", "psnr", "ssim", "max_abs_error", "error"]
+
+def psnr_from_mse(mse, max_pixel=255.0):
+    """PSNR in dB for a given MSE; infinite for identical images."""
+    if mse == 0:
+        return float('inf')
+    return 20 * math.log10(max_pixel / math.sqrt(mse))
+
+def _ssim_block_sums(cover_block, stego_block):
+    """Sum and count of SSIM values over the whole 8x8 windows of one RGB row block."""
+    rows = cover_block.shape[0] // SSIM_WINDOW * SSIM_WINDOW
+    cols = cover_block.shape[1] // SSIM_WINDOW * SSIM_WINDOW
+    if rows == 0 or cols == 0:
+        return 0.0, 0
+    shape = (rows // SSIM_WINDOW, SSIM_WINDOW, cols // SSIM_WINDOW, SSIM_WINDOW, 3)
+    x = cover_block[:rows, :cols].astype(np.float64).reshape(shape)
+    y = stego_block[:rows, :cols].astype(np.float64).reshape(shape)
+    mean_x = x.mean(axis=(1, 3))
+    mean_y = y.mean(axis=(1, 3))
+    var_x = (x * x).mean(axis=(1, 3)) - mean_x ** 2
+    var_y = (y * y).mean(axis=(1, 3)) - mean_y ** 2
+    cov = (x * y).mean(axis=(1, 3)) - mean_x * mean_y
+    ssim = ((2 * mean_x * mean_y + SSIM_C1) * (2 * cov + SSIM_C2)) / ((mean_x ** 2 + mean_y ** 2 + SSIM_C1) * (var_x + var_y + SSIM_C2))
+    return float(ssim.sum()), ssim.size
+
+@traced("compare_images")
+def compare_images(cover_path, stego_path, block_rows=BLOCK_ROWS):
+    """Computes MSE, PSNR, SSIM and max-abs-error between two images in one pass.
+
+    Both images are compared BLOCK_ROWS rows at a time as RGB; differences are
+    taken in int16 and squared errors summed in int64, so only one block of
+    each image is ever held as an array. SSIM is the mean over non-overlapping
+    8x8 windows of each channel. Returns a dict of the metrics. tracer (a
+    StageTracer) records the decode and compare time of every block.
+    """
+    if block_rows % SSIM_WINDOW:
+        raise ValueError(f"block_rows must be a multiple of {SSIM_WINDOW}")
+    with Image.open(cover_path) as cover_image, Image.open(stego_path) as stego_image:
+        if cover_image.size != stego_image.size:
+            raise ValueError("Images have different dimensions")
+        width, height = cover_image.size
+
+        squared_error = np.zeros(3, dtype=np.int64)
+        max_abs_error = 0
+        ssim_sum, ssim_count = 0.0, 0
+        for top in range(0, height, block_rows):
+            box = (0, top, width, min(top + block_rows, height))
+            with trace_stage("decode_block") as stage:
+                cover_block = np.asarray(cover_image.crop(box).convert('RGB'))
+                stego_block = np.asarray(stego_image.crop(box).convert('RGB'))
+                stage["bytes"] = cover_block.nbytes + stego_block.nbytes
+
+            with trace_stage("compare_block", cover_block.nbytes + stego_block.nbytes):
+                diff = cover_block.astype(np.int16) - stego_block
+                squared_error += np.einsum('ijk,ijk->k', diff, diff, dtype=np.int64)
+                max_abs_error = max(max_abs_error, int(np.abs(diff).max()))
+                block_sum, block_count = _ssim_block_sums(cover_block, stego_block)
+                ssim_sum += block_sum
+                ssim_count += block_count
+
+    mse_r, mse_g, mse_b = (squared_error / (width * height)).tolist()
+    mse = (mse_r + mse_g + mse_b) / 3
+    return {
+        "cover": cover_path,
+        "stego": stego_path,
+        "width": width,
+        "height": height,
+        "mse_r": mse_r,
+        "mse_g": mse_g,
+        "mse_b": mse_b,
+        "mse": mse,
+        "psnr": psnr_from_mse(mse),
+        "ssim": ssim_sum / ssim_count if ssim_count else float('nan'),
+        "max_abs_error": max_abs_error,
+    }
+
+def calculate_mse_psnr(cover_path, stego_path, tracer=None):
     """Calculate MSE and PSNR between cover and stego images."""
     try:
-        # Load images
-        cover_image = Image.open(cover_path).convert('RGB')
-        stego_image = Image.open(stego_path).convert('RGB')
-        
-        # Convert to numpy arrays
-        cover_array = np.array(cover_image)
-        stego_array = np.array(stego_image)
-        
-        # Ensure images have same dimensions
-        if cover_array.shape != stego_array.shape:
-            raise ValueError("Images have different dimensions")
-        
-        # Calculate MSE for each channel
-        mse_r = np.mean((cover_array[:,:,0] - stego_array[:,:,0]) ** 2)
-        mse_g = np.mean((cover_array[:,:,1] - stego_array[:,:,1]) ** 2)
-        mse_b = np.mean((cover_array[:,:,2] - stego_array[:,:,2]) ** 2)
-        
-        # Average MSE across channels
-        mse = (mse_r + mse_g + mse_b) / 3
-        
-        # Calculate PSNR
-        if mse == 0:
-            psnr = float('inf')
-        else:
-            max_pixel = 255.0
-            psnr = 20 * math.log10(max_pixel / math.sqrt(mse))
-        
+        metrics = compare_images(cover_path, stego_path, tracer=tracer)
+        mse_r, mse_g, mse_b = metrics["mse_r"], metrics["mse_g"], metrics["mse_b"]
+        mse, psnr = metrics["mse"], metrics["psnr"]
+
         # Print results
         print("\nImage Quality Metrics:")
         print("-" * 50)
@@ -45,8 +106,10 @@ def calculate_mse_psnr(cover_path, stego_path):
         print(f"  Average MSE   : {mse:.6f}")
         print(f"\nPeak Signal-to-Noise Ratio (PSNR):")
         print(f"  PSNR Value    : {psnr:.6f} dB")
+        print(f"\nStructural Similarity (SSIM): {metrics['ssim']:.6f}")
+        print(f"Max Absolute Error          : {metrics['max_abs_error']}")
         print("-" * 50)
-        
+
         # Interpret results
         print("\nAnalysis:")
         if psnr >= 40:
@@ -57,7 +120,7 @@ def calculate_mse_psnr(cover_path, stego_path):
             print("⚠ Fair quality (PSNR >= 20 dB)")
         else:
             print("✗ Poor quality (PSNR < 20 dB)")
-            
+
         if mse < 2:
             print("✓ Very low distortion (MSE < 2)")
         elif mse < 10:
@@ -66,22 +129,79 @@ def calculate_mse_psnr(cover_path, stego_path):
             print("⚠ Moderate distortion (MSE < 25)")
         else:
             print("✗ High distortion (MSE >= 25)")
-            
+
         return mse, psnr
-        
+
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
 
+def compare_pair(job):
+    """Worker entry point: (row, error or None, metrics with any failure recorded in 'error', trace events or None)."""
+    row, entry, trace = job
+    tracer = StageTracer() if trace else None
+    try:
+        result = compare_images(entry["cover"], entry["stego"], tracer=tracer)
+        result["error"] = None
+    except KeyError as e:
+        result = {"cover": entry.get("cover"), "stego": entry.get("stego"), "error": f"Missing manifest column {e}"}
+    except Exception as e:
+        result = {"cover": entry.get("cover"), "stego": entry.get("stego"), "error": str(e)}
+    return row, result["error"], result, tracer and tracer.events
+
+def describe_metrics(result):
+    """Status line text for one compared pair."""
+    return f"MSE {result['mse']:.6f}  PSNR {result['psnr']:.2f} dB  SSIM {result['ssim']:.6f}  max error {result['max_abs_error']}"
+
+def write_results(results, output_path):
+    """Writes batch results as JSON (.json) or CSV (anything else)."""
+    if output_path.endswith(".json"):
+        # JSON has no infinity, so identical pairs get a null PSNR
+        rows = [{k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in r.items()} for r in results]
+        with open(output_path, "w") as f:
+            json.dump(rows, f, indent=2)
+        return
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+def run_batch(manifest_path, output_path=None, workers=None, trace_path=None):
+    """Compares every cover/stego pair of a manifest over a process pool.
+
+    Uses the manifest loader and pool runner of the steganography batch
+    mode (see stego_core.run_jobs), prints one line per pair and returns the
+    number of failed rows. With trace_path, the stages of every pair are
+    written to one Chrome trace.
+    """
+    entries = load_manifest(manifest_path)
+    jobs = [(row, entry, trace_path is not None) for row, entry in enumerate(entries, start=1)]
+    results, failures = run_jobs(compare_pair, jobs, workers, trace_path, describe_metrics)
+    if output_path:
+        write_results(results, output_path)
+        print(f"Results saved to {output_path}")
+    return failures
+
 def main():
     parser = argparse.ArgumentParser(description="Calculate MSE and PSNR for steganographic images")
-    parser.add_argument("-c", "--cover", required=True, help="Path to cover image")
-    parser.add_argument("-s", "--stego", required=True, help="Path to stego image")
-    
+    parser.add_argument("-c", "--cover", help="Path to cover image")
+    parser.add_argument("-s", "--stego", help="Path to stego image")
+    parser.add_argument("-m", "--manifest", help="CSV (with header) or .jsonl manifest of cover/stego pairs to compare in parallel")
+    parser.add_argument("-o", "--output", help="Write batch results to a .csv or .json file")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes for a manifest (default: CPU count)")
+    parser.add_argument("--trace", help="Write per-stage wall/CPU time, bytes and peak memory to this Chrome trace JSON file")
+
     args = parser.parse_args()
-    
+    if not args.manifest and not (args.cover and args.stego):
+        parser.error("either -c/--cover and -s/--stego or -m/--manifest is required")
+
     try:
-        mse, psnr = calculate_mse_psnr(args.cover, args.stego)
+        if args.manifest:
+            return 1 if run_batch(args.manifest, args.output, args.workers, args.trace) else 0
+        tracer = StageTracer() if args.trace else None
+        mse, psnr = calculate_mse_psnr(args.cover, args.stego, tracer)
+        if tracer:
+            tracer.save(args.trace)
         return 0
     except Exception as e:
         print(f"Error: {str(e)}")
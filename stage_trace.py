@@ -0,0 +1,184 @@
+"""-------------------------------------Stage Traces (Chrome Trace Format): By Damodhar Pai------------------------------------------------"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource  # peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+class StageTracer:
+    """Collects per-stage wall time, CPU time, bytes and peak memory as Chrome trace events.
+
+    Events are "X" (complete) events stamped with the wall clock in
+    microseconds, so traces written by several processes line up when merged.
+    peak_rss_kb is the process high-water mark when the stage ends;
+    peak_traced_bytes is the stage's own peak and is recorded only while
+    tracemalloc is running (python -X tracemalloc).
+    """
+
+    def __init__(self, category="stego"):
+        self.category = category
+        self.events = []
+        self._peaks = []  # traced peak of each open stage, outermost first
+
+    def _lift_peaks(self, peak):
+        for i, open_peak in enumerate(self._peaks):
+            self._peaks[i] = max(open_peak, peak)
+
+    @contextlib.contextmanager
+    def stage(self, name, nbytes=0):
+        """Times the block as one event; yields its args dict so callers can fill in "bytes" later."""
+        tracing_memory = tracemalloc.is_tracing()
+        if tracing_memory:
+            # reset_peak() is global, so open stages keep the peak reached so far
+            self._lift_peaks(tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._peaks.append(0)
+        args = {"bytes": nbytes}
+        timestamp = time.time_ns() // 1000
+        start, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield args
+        finally:
+            duration = time.perf_counter() - start
+            args["cpu_ms"] = (time.process_time() - start_cpu) * 1000
+            peak = self._peaks.pop()
+            if tracing_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                self._lift_peaks(peak)
+                args["peak_traced_bytes"] = peak
+            if resource is not None:
+                args["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.events.append({
+                "name": name,
+                "cat": self.category,
+                "ph": "X",
+                "ts": timestamp,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": args,
+            })
+
+    def save(self, path):
+        write_trace(self.events, path)
+
+_ACTIVE_TRACERS = []
+
+def trace_stage(name, nbytes=0):
+    """Times a stage on the active tracer; a no-op yielding a throwaway dict when tracing is off."""
+    if not _ACTIVE_TRACERS:
+        return contextlib.nullcontext({})
+    return _ACTIVE_TRACERS[-1].stage(name, nbytes)
+
+def active_tracer():
+    """The tracer trace_stage currently records to, or None when tracing is off."""
+    return _ACTIVE_TRACERS[-1] if _ACTIVE_TRACERS else None
+
+@contextlib.contextmanager
+def tracing(tracer):
+    """Routes trace_stage calls in the block to tracer; None leaves the active tracer unchanged."""
+    if tracer is None:
+        yield
+        return
+    _ACTIVE_TRACERS.append(tracer)
+    try:
+        yield
+    finally:
+        _ACTIVE_TRACERS.pop()
+
+def traced(name):
+    """Decorator adding a tracer=None keyword that activates tracer and times the whole call as stage name."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, tracer=None, **kwargs):
+            with tracing(tracer), trace_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def write_trace(events, path):
+    """Writes events as a Chrome trace (chrome://tracing, Perfetto)."""
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def load_events(path):
+    """Events of a trace file in either the object or the bare-array Chrome trace form."""
+    with open(path) as f:
+        trace = json.load(f)
+    return trace["traceEvents"] if isinstance(trace, dict) else trace
+
+def summarize(events):
+    """Per-stage totals over complete events: count, wall and CPU time, bytes and peak memory."""
+    stages = {}
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        args = event.get("args", {})
+        stage = stages.setdefault(event["name"], {"count": 0, "durations": [], "cpu_ms": 0.0, "bytes": 0, "peak_rss_kb": 0, "peak_traced_bytes": None})
+        stage["count"] += 1
+        stage["durations"].append(event["dur"] / 1000)
+        stage["cpu_ms"] += args.get("cpu_ms", 0.0)
+        stage["bytes"] += args.get("bytes", 0)
+        stage["peak_rss_kb"] = max(stage["peak_rss_kb"], args.get("peak_rss_kb", 0))
+        if "peak_traced_bytes" in args:
+            stage["peak_traced_bytes"] = max(stage["peak_traced_bytes"] or 0, args["peak_traced_bytes"])
+
+    summary = []
+    for name, stage in stages.items():
+        durations = sorted(stage.pop("durations"))
+        total_ms = sum(durations)
+        summary.append(dict(
+            stage=name,
+            total_ms=total_ms,
+            mean_ms=total_ms / len(durations),
+            p95_ms=durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+            mb_per_s=stage["bytes"] / (1024 * 1024) / (total_ms / 1000) if stage["bytes"] and total_ms else None,
+            **stage,
+        ))
+    return sorted(summary, key=lambda s: s["total_ms"], reverse=True)
+
+def print_summary(summary):
+    print("\nStage summary (sorted by total time):")
+    print("-" * 104)
+    print(f"  {'Stage':<24} {'Count':>6} {'Total':>11} {'Mean':>10} {'p95':>10} {'CPU':>11} {'MB/s':>9} {'Peak RSS':>11}")
+    for s in summary:
+        rate = f"{s['mb_per_s']:9.1f}" if s["mb_per_s"] is not None else f"{'-':>9}"
+        print(f"  {s['stage']:<24} {s['count']:>6} {s['total_ms']:8.1f} ms {s['mean_ms']:7.2f} ms {s['p95_ms']:7.2f} ms "
+              f"{s['cpu_ms']:8.1f} ms {rate} {s['peak_rss_kb'] / 1024:8.1f} MB")
+    print("-" * 104)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge --trace files and summarize time, CPU, bytes and memory per stage")
+    parser.add_argument("traces", nargs="+", help="Trace files written with --trace")
+    parser.add_argument("-o", "--output", help="Write all events to one merged Chrome trace")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON instead of a table")
+
+    args = parser.parse_args()
+
+    try:
+        events = [event for path in args.traces for event in load_events(path)]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    summary = summarize(events)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    if args.output:
+        write_trace(events, args.output)
+        print(f"Merged trace saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
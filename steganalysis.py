@@ -0,0 +1,265 @@
+"""-------------------------------------LSB Steganalysis (Chi-square, RS, Sample Pairs): By Damodhar Pai------------------------------------------------"""
+import numpy as np
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import json
+import math
+import os
+
+IMAGE_EXTENSIONS = (".png", ".bmp", ".tif", ".tiff", ".webp", ".jpg", ".jpeg")
+WINDOW_SAMPLES = 1 << 16  # channel samples per chi-square window
+WINDOW_STEP = 1 << 14
+CHI_SQUARE_MIN_EXPECTED = 4  # value pairs with fewer expected samples are too noisy to count
+CHI_SQUARE_FLAG = 0.5  # windows with a p-value above this look like LSB embedding
+RS_MASK = np.array([0, 1, 1, 0], dtype=np.int16)
+DEFAULT_THRESHOLD = 0.05  # estimated bits per channel sample above which an image is reported as suspicious
+RESULT_FIELDS = ["path", "width", "height", "chi_square_p", "flagged_windows", "rs_rate", "spa_rate", "estimated_rate", "suspicious", "error"]
+
+def _upper_gamma_regularized(a, x):
+    """Q(a, x) = Gamma(a, x) / Gamma(a), by series for small x and continued fraction otherwise."""
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Modified Lentz evaluation of the continued fraction
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+def chi_square_p(histogram):
+    """Westfeld-Pfitzmann chi-square attack on one 256-bin histogram.
+
+    LSB replacement evens out the counts of each value pair (2k, 2k+1); the
+    returned p-value approaches 1 as the pairs become equal.
+    """
+    pairs = np.asarray(histogram, dtype=np.float64).reshape(-1, 2)
+    expected = pairs.sum(axis=1) / 2
+    used = expected > CHI_SQUARE_MIN_EXPECTED
+    if used.sum() < 2:
+        return 0.0
+    statistic = float((((pairs[used, 0] - expected[used]) ** 2) / expected[used]).sum())
+    degrees = int(used.sum()) - 1
+    return _upper_gamma_regularized(degrees / 2, statistic / 2)
+
+def sliding_chi_square(samples, window=WINDOW_SAMPLES, step=WINDOW_STEP):
+    """Chi-square p-values for windows of `window` samples every `step` samples.
+
+    samples is the flat R, G, B sample stream in embedding order. Histograms
+    of every step-sized block come from a single bincount; window histograms
+    are differences of their running sums.
+    """
+    if window % step:
+        raise ValueError("window must be a multiple of step")
+    blocks = len(samples) // step
+    if blocks * step < window:
+        return np.array([chi_square_p(np.bincount(samples, minlength=256))])
+    block_ids = np.repeat(np.arange(blocks, dtype=np.int64) * 256, step)
+    block_hists = np.bincount(block_ids + samples[:blocks * step], minlength=blocks * 256).reshape(blocks, 256)
+    cumulative = np.vstack([np.zeros(256, dtype=np.int64), np.cumsum(block_hists, axis=0)])
+    span = window // step
+    window_hists = cumulative[span:] - cumulative[:-span]
+    return np.array([chi_square_p(h) for h in window_hists])
+
+def _rs_counts(groups, flipped):
+    """Fractions of regular and singular groups after applying the flipped mask values."""
+    before = np.abs(np.diff(groups, axis=1)).sum(axis=1)
+    after = np.abs(np.diff(flipped, axis=1)).sum(axis=1)
+    return (after > before).mean(), (after < before).mean()
+
+def rs_rate(channel):
+    """Fridrich's RS estimate of the fraction of samples carrying LSB payload in one channel."""
+    width = channel.shape[1] // len(RS_MASK) * len(RS_MASK)
+    groups = channel[:, :width].reshape(-1, len(RS_MASK)).astype(np.int16)
+    if not len(groups):
+        return 0.0
+    mask = RS_MASK.astype(bool)
+
+    def differences(g):
+        positive = g.copy()
+        positive[:, mask] ^= 1
+        negative = g.copy()
+        negative[:, mask] = ((negative[:, mask] + 1) ^ 1) - 1
+        r_m, s_m = _rs_counts(g, positive)
+        r_neg, s_neg = _rs_counts(g, negative)
+        return r_m - s_m, r_neg - s_neg
+
+    d0, d_neg0 = differences(groups)
+    d1, d_neg1 = differences(groups ^ 1)
+    a = 2 * (d1 + d0)
+    b = d_neg0 - d_neg1 - d1 - 3 * d0
+    c = d0 - d_neg0
+    if a == 0:
+        x = -c / b if b else 0.0
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            return 0.0
+        roots = ((-b + math.sqrt(discriminant)) / (2 * a), (-b - math.sqrt(discriminant)) / (2 * a))
+        x = min(roots, key=abs)
+    if x == 0.5:
+        return 1.0
+    return float(x / (x - 0.5))
+
+def spa_rate(channel):
+    """Dumitrescu-Wu-Wang sample pair estimate of the embedding rate in one channel."""
+    u = channel[:, :-1].reshape(-1).astype(np.int16)
+    v = channel[:, 1:].reshape(-1).astype(np.int16)
+    if not len(u):
+        return 0.0
+    v_even = (v & 1) == 0
+    x = np.count_nonzero((v_even & (u < v)) | (~v_even & (u > v)))
+    y = np.count_nonzero((v_even & (u > v)) | (~v_even & (u < v)))
+    z = np.count_nonzero(u == v)
+    w = np.count_nonzero(((u >> 1) == (v >> 1)) & (u != v))
+    pairs = len(u)
+    a = (w + z) / 2
+    b = 2 * x - pairs
+    c = y - x
+    if a == 0:
+        return 0.0
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return 0.0
+    roots = ((-b + math.sqrt(discriminant)) / (2 * a), (-b - math.sqrt(discriminant)) / (2 * a))
+    return float(min(roots, key=abs))
+
+def analyze_image(path, window=WINDOW_SAMPLES, step=WINDOW_STEP, threshold=DEFAULT_THRESHOLD):
+    """Runs all three detectors on an image without needing its cover.
+
+    Returns a dict with the whole-image chi-square p-value, the fraction of
+    sliding windows flagged by the chi-square attack, the RS and sample pair
+    rates averaged over R, G and B, and the estimated embedding rate in bits
+    per channel sample. RS and sample pair analysis lose accuracy close to
+    full embedding, so the fraction of flagged windows (which tracks how far a
+    sequential payload reaches) is used when it is higher than their mean.
+    """
+    with Image.open(path) as image:
+        rgb = image.convert('RGB')
+        width, height = rgb.size
+        channels = [np.asarray(channel) for channel in rgb.split()]
+        samples = np.asarray(rgb).reshape(-1)
+
+    window_p = sliding_chi_square(samples, window, step)
+    rs = float(np.mean([rs_rate(channel) for channel in channels]))
+    spa = float(np.mean([spa_rate(channel) for channel in channels]))
+    flagged = float((window_p > CHI_SQUARE_FLAG).mean())
+    estimated = min(1.0, max(0.0, (rs + spa) / 2, flagged))
+    return {
+        "path": path,
+        "width": width,
+        "height": height,
+        "chi_square_p": chi_square_p(np.bincount(samples, minlength=256)),
+        "flagged_windows": flagged,
+        "rs_rate": rs,
+        "spa_rate": spa,
+        "estimated_rate": estimated,
+        "suspicious": estimated > threshold,
+    }
+
+def analyze_job(job):
+    """Worker entry point: analysis of one image, with any failure recorded in 'error'."""
+    path, window, step, threshold = job
+    try:
+        result = analyze_image(path, window, step, threshold)
+        result["error"] = None
+    except Exception as e:
+        result = {"path": path, "error": str(e)}
+    return result
+
+def collect_images(paths):
+    """Expands files and directories (recursively) into a sorted list of image paths."""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                images.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            images.append(path)
+    return sorted(images)
+
+def write_results(results, output_path):
+    """Writes scan results as JSON (.json) or CSV (anything else)."""
+    if output_path.endswith(".json"):
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+        return
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+def scan(paths, workers=None, window=WINDOW_SAMPLES, step=WINDOW_STEP, threshold=DEFAULT_THRESHOLD, output_path=None):
+    """Analyzes every image under paths over a process pool and prints one line per image.
+
+    Returns (number of suspicious images, number of images that failed).
+    """
+    images = collect_images(paths)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(images) // (workers * 4))
+    jobs = [(path, window, step, threshold) for path in images]
+
+    results = []
+    suspicious = failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(analyze_job, jobs, chunksize=chunksize):
+            results.append(result)
+            if result["error"] is not None:
+                failures += 1
+                print(f"[error] {result['path']}: {result['error']}")
+                continue
+            suspicious += result["suspicious"]
+            status = "suspicious" if result["suspicious"] else "clean"
+            print(f"[{status}] {result['path']}: estimated rate {result['estimated_rate']:.3f} "
+                  f"(RS {result['rs_rate']:.3f}, SPA {result['spa_rate']:.3f}), "
+                  f"chi-square p {result['chi_square_p']:.3f}, {result['flagged_windows']:.0%} windows flagged")
+    if output_path:
+        write_results(results, output_path)
+        print(f"Results saved to {output_path}")
+    print(f"Scanned {len(results)} images: {suspicious} suspicious, {failures} failed.")
+    return suspicious, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate LSB embedding rates with chi-square, RS and sample pair analysis (no cover needed)")
+    parser.add_argument("paths", nargs="+", help="Images or directories to scan")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--window", type=int, default=WINDOW_SAMPLES, help=f"Channel samples per chi-square window (default: {WINDOW_SAMPLES})")
+    parser.add_argument("--step", type=int, default=WINDOW_STEP, help=f"Samples between window starts; must divide --window (default: {WINDOW_STEP})")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Estimated rate above which an image is suspicious (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("-o", "--output", help="Write results to a .csv or .json file")
+
+    args = parser.parse_args()
+
+    try:
+        suspicious, failures = scan(args.paths, args.workers, args.window, args.step, args.threshold, args.output)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    return 1 if suspicious or failures else 0
+
+if __name__ == "__main__":
+    exit(main())
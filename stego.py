@@ -0,0 +1,122 @@
+"""-------------------------------------Unified Steganography Command Line: By Damodhar Pai------------------------------------------------"""
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (module name, script path or None for root-level modules, help)
+# Nothing heavier than argparse is imported until a subcommand actually runs.
+TOOLS = {
+    "text": ("text_stego", os.path.join(ROOT, "Text inside an image", "cryptosteganography.py"), "Hide or retrieve a text message (save/retrieve/batch)."),
+    "image": ("image_stego", os.path.join(ROOT, "Image Inside an Image", "cryptosteganography.py"), "Hide or retrieve an image (save/retrieve/batch)."),
+    "daemon": ("stego_daemon", None, "Serve save/retrieve/metrics requests from warm workers."),
+    "metrics": ("quality_metrics", None, "MSE and PSNR between cover and stego images."),
+    "histogram": ("histogram_analysis", None, "RGB histogram comparison (use --no-plot for statistics only)."),
+    "steganalysis": ("steganalysis", None, "Estimate LSB embedding rates without the cover."),
+    "capacity": ("capacity_calculator", None, "Capacity and PSNR for every LSB depth."),
+    "bench-cipher": ("cipher_benchmark", None, "Legacy XOR vs AES-256 throughput."),
+    "bench": ("benchmark_suite", None, "Time the hot paths on synthetic covers and compare with a baseline."),
+    "trace": ("stage_trace", None, "Merge --trace files and summarize time and memory per stage."),
+}
+
+# Wall-clock budgets (ms) for a cold interpreter to reach each command's argument parsing, or to
+# finish a real save/retrieve of the sample images; {placeholders} are files in a scratch directory
+IMPORT_BUDGETS_MS = {
+    "--help": 150,
+    "text save --help": 900,
+    "text retrieve --help": 900,
+    "image save --help": 900,
+    "image retrieve --help": 900,
+    "histogram --help": 400,
+    "text save -i {cover} -m budget -o {text_stego} --password-env STEGO_BUDGET_PASSWORD": 1500,
+    "text retrieve -i {text_stego} --password-env STEGO_BUDGET_PASSWORD": 1200,
+    "image save -i {cover} -s {secret} -o {image_stego} --password-env STEGO_BUDGET_PASSWORD": 1500,
+    "image retrieve -i {image_stego} -o {revealed} --password-env STEGO_BUDGET_PASSWORD": 1200,
+}
+
+def load_tool(name):
+    """Import the module behind a subcommand; script folders with spaces are loaded by path."""
+    module_name, path, _ = TOOLS[name]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if path is None:
+        return importlib.import_module(module_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered before execution so process-pool workers can unpickle its functions
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def measure_import_budget(repeat=3):
+    """Time cold starts of each budgeted command and list the slowest imports.
+
+    Save and retrieve commands run on the sample images under images/ and
+    are timed end to end, so their budgets include the KDF and the PNG codec.
+    Returns True if every command succeeded and stayed within its budget.
+    """
+    import re
+    import subprocess
+    import tempfile
+    import time
+
+    within_budget = True
+    env = dict(os.environ, STEGO_BUDGET_PASSWORD="import-budget")
+    print("\nImport-time budget (best of {} cold starts):".format(repeat))
+    print("-" * 72)
+    with tempfile.TemporaryDirectory() as scratch:
+        files = {
+            "cover": os.path.join(ROOT, "images", "cover_image.jpeg"),
+            "secret": os.path.join(ROOT, "images", "secret_image.jpeg"),
+            "text_stego": os.path.join(scratch, "text_stego.png"),
+            "image_stego": os.path.join(scratch, "image_stego.png"),
+            "revealed": os.path.join(scratch, "revealed.png"),
+        }
+        for command, budget in IMPORT_BUDGETS_MS.items():
+            argv = [sys.executable, os.path.abspath(__file__)] + [arg.format(**files) for arg in command.split()]
+            best = float('inf')
+            failed = False
+            for _ in range(repeat):
+                start = time.perf_counter()
+                failed |= subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env).returncode != 0
+                best = min(best, (time.perf_counter() - start) * 1000)
+
+            # -X importtime reports per-module cumulative microseconds on stderr
+            trace = subprocess.run([sys.executable, "-X", "importtime"] + argv[1:], capture_output=True, text=True, env=env).stderr
+            top_level = [(int(m.group(1)), m.group(2)) for m in re.finditer(r"^import time:\s+\d+ \|\s+(\d+) \| (\S+)$", trace, re.M)]
+            heaviest = ", ".join(f"{name} {us / 1000:.0f}ms" for us, name in sorted(top_level, reverse=True)[:3])
+
+            status = "FAILED" if failed else "ok" if best <= budget else "OVER"
+            within_budget &= not failed and best <= budget
+            label = command.split(" -i ")[0]  # real runs are named by their tool and action
+            print(f"  {label:<24} {best:7.1f} ms / {budget:4d} ms  [{status}]  {heaviest}")
+    print("-" * 72)
+    return within_budget
+
+def main():
+    # Tool arguments (including their own -h) are forwarded untouched, so argparse never sees them
+    if len(sys.argv) > 1 and sys.argv[1] in TOOLS:
+        tool = sys.argv[1]
+        module = load_tool(tool)
+        sys.argv = [f"{os.path.basename(sys.argv[0])} {tool}"] + sys.argv[2:]
+        return module.main() or 0
+
+    parser = argparse.ArgumentParser(
+        description="Steganography toolkit. Each subcommand forwards its remaining arguments to the underlying tool.",
+    )
+    subparsers = parser.add_subparsers(dest="tool", required=True)
+    for name, (_, _, help_text) in TOOLS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    budget_parser = subparsers.add_parser("import-budget", help="Measure cold-start import time against the budgets.")
+    budget_parser.add_argument("--repeat", type=int, default=3, help="Cold starts per command (default: 3)")
+
+    args = parser.parse_args()
+
+    # Only import-budget reaches here; tool subparsers exist for the help listing
+    return 0 if measure_import_budget(args.repeat) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1065 @@
+"""-------------------------------------Shared Steganography Engine: By Damodhar Pai------------------------------------------------"""
+import csv
+import hashlib
+import hmac
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from PIL import Image
+from stage_trace import StageTracer, active_tracer, trace_stage, tracing, write_trace
+
+def legacy_key(password, length=32):
+    """Repeats or truncates the password to 32 bytes; only used to decode legacy XOR images."""
+    password = password.encode()
+    return (password * (length // len(password) + 1))[:length]
+
+KDF_SCRYPT = 1
+KDF_PBKDF2 = 2
+KDFS = {"scrypt": KDF_SCRYPT, "pbkdf2": KDF_PBKDF2}
+DEFAULT_KDF_COST = {KDF_SCRYPT: 14, KDF_PBKDF2: 19}  # log2 of scrypt N / PBKDF2 iterations
+MAX_KDF_COST = {KDF_SCRYPT: 17, KDF_PBKDF2: 22}  # bounds work done for an unauthenticated header
+SCRYPT_R = 8
+SALT_SIZE = 16
+KEY_SIZE = 32
+KEY_CACHE_SIZE = 64
+
+def _run_kdf(password, salt, kdf_id, cost):
+    """Derives a 256-bit key from the password with scrypt or PBKDF2-HMAC-SHA256."""
+    if kdf_id == KDF_SCRYPT:
+        n = 1 << cost
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=SCRYPT_R, p=1,
+                              maxmem=256 * SCRYPT_R * n, dklen=KEY_SIZE)
+    if kdf_id == KDF_PBKDF2:
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 1 << cost, dklen=KEY_SIZE)
+    raise ValueError(f"Unknown KDF id {kdf_id}")
+
+class DerivedKeyCache:
+    """Size-bounded LRU cache of derived keys, keyed by (password hash, salt, KDF params).
+
+    Lets batch runs and long-lived processes pay the KDF once per password and
+    salt. Cached keys live in bytearrays that are overwritten with zeros when
+    evicted or cleared.
+    """
+
+    def __init__(self, max_entries=KEY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, password, salt, kdf_id, cost):
+        """Returns the derived key, running the KDF only on a cache miss."""
+        cache_key = (hashlib.sha256(password.encode()).digest(), bytes(salt), kdf_id, cost)
+        with self._lock:
+            key = self._entries.get(cache_key)
+            if key is not None:
+                self._entries.move_to_end(cache_key)
+                return bytes(key)
+        key = bytearray(_run_kdf(password, salt, kdf_id, cost))
+        with self._lock:
+            self._entries[cache_key] = key
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                evicted[:] = bytes(len(evicted))
+        return bytes(key)
+
+    def clear(self):
+        """Zeroizes and drops every cached key."""
+        with self._lock:
+            for key in self._entries.values():
+                key[:] = bytes(len(key))
+            self._entries.clear()
+
+KEY_CACHE = DerivedKeyCache()
+
+def derive_key(password, salt, kdf_id=KDF_SCRYPT, cost=None):
+    """Derives (or fetches from KEY_CACHE) the 256-bit key for a password and salt."""
+    if cost is None:
+        cost = DEFAULT_KDF_COST[kdf_id]
+    if kdf_id not in KDFS.values() or not 1 <= cost <= MAX_KDF_COST[kdf_id]:
+        raise ValueError("Unsupported KDF parameters")
+    with trace_stage("derive_key"):
+        return KEY_CACHE.get(password, salt, kdf_id, cost)
+
+MAGIC = b"STG"  # Marks stego images written with AES; older images carry XOR data
+FORMAT_VERSION = 1
+CIPHER_CTR = 1
+CIPHER_GCM = 2
+CIPHERS = {"ctr": CIPHER_CTR, "gcm": CIPHER_GCM}
+NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+CHUNK_SIZE = 1 << 20  # 1 MiB per call into the native AES primitive
+# Payload encodings of both tools share one ID space, so each can tell what an image holds
+ENCODING_TEXT = 0  # The text tool's tag followed by the UTF-8 message
+ENCODING_FILE = 1  # The secret image's original encoded file bytes
+ENCODING_ZLIB = 2  # zlib-compressed pixels in the secret's native mode
+ENCODING_LZMA = 3  # LZMA-compressed pixels in the secret's native mode
+ENCODING_CONTAINER = 4  # Body is an index followed by independently encrypted file chunks
+ENCODING_RGBA = 5  # Secret dimensions followed by uncompressed RGBA pixels
+PAYLOAD_KINDS = {ENCODING_TEXT: "a text message", ENCODING_FILE: "an image", ENCODING_ZLIB: "an image",
+                 ENCODING_LZMA: "an image", ENCODING_CONTAINER: "files", ENCODING_RGBA: "an image"}
+FLAG_ALPHA = 0x01  # Body also uses the alpha channel
+FLAG_SCATTER = 0x02  # Body values sit at keyed pseudo-random positions
+FLAG_SHARD = 0x04  # Body starts with a shard record; the ciphertext is split over several images
+FEISTEL_ROUNDS = 4
+MAX_BITS_PER_CHANNEL = 4
+HEADER_FORMAT = ">3sBBBBBBB16s12sI"  # magic, version, cipher id, payload encoding, bits per channel, flags, KDF id, KDF cost, salt, nonce, body length
+HEADER_MAC_SIZE = 16
+HEADER_MAC_LABEL = b"stego-header-mac"  # every MAC'd structure has its own label, so no MAC verifies as another kind
+SHARD_MAC_LABEL = b"stego-shard-mac"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT) + HEADER_MAC_SIZE
+BODY_START_PIXEL = -(-HEADER_SIZE * 8 // 3)  # first pixel after the header in non-default layouts
+PREFIX_SIZE = len(MAGIC) + 1  # magic and version, enough to tell new images from legacy ones
+SHARD_FORMAT = ">HH32s"  # shard index, shard count, SHA-256 of the whole ciphertext
+SHARD_RECORD_SIZE = struct.calcsize(SHARD_FORMAT) + HEADER_MAC_SIZE
+MAX_SHARDS = 0xFFFF
+
+def xor_encrypt(data, key):
+    """Legacy XOR cipher, kept only to decode stego images written before AES support."""
+    return bytearray(d ^ key[i % len(key)] for i, d in enumerate(data))
+
+def _aes_cipher(key, cipher_id, nonce, tag=None):
+    """Builds the AES-256 Cipher object for the given mode."""
+    if cipher_id == CIPHER_CTR:
+        # 96-bit nonce followed by a 32-bit block counter starting at zero
+        return Cipher(algorithms.AES(key), modes.CTR(nonce + bytes(4)))
+    if cipher_id == CIPHER_GCM:
+        return Cipher(algorithms.AES(key), modes.GCM(nonce, tag))
+    raise ValueError(f"Unknown cipher id {cipher_id}")
+
+def _aes_stream(context, data):
+    """Runs data through an encryptor/decryptor in CHUNK_SIZE pieces into one preallocated buffer."""
+    view = memoryview(data)
+    out = bytearray(len(data) + 15)  # update_into needs block_size - 1 bytes of slack
+    out_view = memoryview(out)
+    for offset in range(0, len(data), CHUNK_SIZE):
+        chunk = view[offset:offset + CHUNK_SIZE]
+        context.update_into(chunk, out_view[offset:offset + len(chunk) + 15])
+    out_view.release()
+    del out[len(data):]
+    return out
+
+def aes_encrypt(data, key, cipher_id=CIPHER_GCM, nonce=None):
+    """Encrypts data with AES-256-CTR or AES-256-GCM. Returns (nonce, ciphertext[+tag])."""
+    nonce = nonce or os.urandom(NONCE_SIZE)
+    encryptor = _aes_cipher(key, cipher_id, nonce).encryptor()
+    ciphertext = _aes_stream(encryptor, data)
+    encryptor.finalize()
+    if cipher_id == CIPHER_GCM:
+        ciphertext += encryptor.tag
+    return nonce, ciphertext
+
+def aes_decrypt(data, key, cipher_id, nonce):
+    """Decrypts AES-256 data; raises cryptography's InvalidTag if a GCM tag does not verify."""
+    tag = None
+    if cipher_id == CIPHER_GCM:
+        data, tag = memoryview(data)[:-GCM_TAG_SIZE], bytes(data[-GCM_TAG_SIZE:])
+    decryptor = _aes_cipher(key, cipher_id, nonce, tag).decryptor()
+    plaintext = _aes_stream(decryptor, data)
+    decryptor.finalize()
+    return plaintext
+
+def capacity_bytes(width, height):
+    """Number of whole bytes that fit into the RGB LSBs of a width x height image."""
+    return width * height * 3 // 8
+
+def body_capacity(width, height, bits_per_channel=1, use_alpha=False, scatter=False):
+    """Number of body bytes that fit after the header in the given bit layout."""
+    if bits_per_channel == 1 and not use_alpha and not scatter:
+        return capacity_bytes(width, height) - HEADER_SIZE
+    return max(0, width * height - BODY_START_PIXEL) * (4 if use_alpha else 3) * bits_per_channel // 8
+
+Header = namedtuple("Header", "cipher_id encoding bits_per_channel flags kdf_id kdf_cost salt nonce body_length")
+
+def record_mac(key, label, fields):
+    """HMAC-SHA256 over fields with a subkey derived from the encryption key for one kind of record (label)."""
+    mac_key = hmac.new(key, label, hashlib.sha256).digest()
+    return hmac.new(mac_key, fields, hashlib.sha256).digest()[:HEADER_MAC_SIZE]
+
+def pack_header(key, header):
+    """Builds the versioned header followed by a MAC that doubles as a key-check value."""
+    fields = struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, *header)
+    return fields + record_mac(key, HEADER_MAC_LABEL, fields)
+
+def unpack_header(header, password, width, height):
+    """Verifies a header and returns (Header tuple, derived key).
+
+    The key is derived from the password with the header's salt and KDF
+    parameters. Raises ValueError before any body is read if the version or
+    KDF parameters are unsupported, the MAC does not match (wrong password or
+    corruption) or the body would not fit in a width x height image with the
+    recorded bit layout.
+    """
+    fields, mac = bytes(header[:-HEADER_MAC_SIZE]), bytes(header[-HEADER_MAC_SIZE:])
+    magic, version, *values = struct.unpack(HEADER_FORMAT, fields)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported stego format version {version}")
+    header = Header(*values)
+    key = derive_key(password, header.salt, header.kdf_id, header.kdf_cost)
+    if not hmac.compare_digest(mac, record_mac(key, HEADER_MAC_LABEL, fields)):
+        raise ValueError("Invalid password or corrupted header")
+    if header.cipher_id not in CIPHERS.values() or not 1 <= header.bits_per_channel <= MAX_BITS_PER_CHANNEL:
+        raise ValueError("Corrupted header")
+    if header.body_length > body_capacity(width, height, header.bits_per_channel, bool(header.flags & FLAG_ALPHA), bool(header.flags & FLAG_SCATTER)):
+        raise ValueError("Corrupted header")
+    return header, key
+
+def pack_envelope(data, password, cipher_id=CIPHER_GCM, encoding=ENCODING_TEXT, bits_per_channel=1, flags=0, kdf_id=KDF_SCRYPT, salt=None):
+    """Derives a key for a fresh (or given) salt, encrypts data and prepends the authenticated header.
+
+    Returns (envelope, key).
+    """
+    salt = salt or os.urandom(SALT_SIZE)
+    cost = DEFAULT_KDF_COST[kdf_id]
+    key = derive_key(password, salt, kdf_id, cost)
+    with trace_stage("encrypt", len(data)):
+        nonce, body = aes_encrypt(data, key, cipher_id)
+    header = Header(cipher_id, encoding, bits_per_channel, flags, kdf_id, cost, salt, nonce, len(body))
+    return pack_header(key, header) + body, key
+
+def _bit_weights(bits_per_channel):
+    """Place values of the k low bits of a channel, most significant first."""
+    return (1 << np.arange(bits_per_channel - 1, -1, -1)).astype(np.uint8)
+
+def _bits_to_values(bits, bits_per_channel):
+    """Groups a 0/1 bit array into bits_per_channel-bit values (zero-padded at the end)."""
+    if bits_per_channel == 1:
+        return bits
+    padded = np.zeros(-(-bits.size // bits_per_channel) * bits_per_channel, dtype=np.uint8)
+    padded[:bits.size] = bits
+    return padded.reshape(-1, bits_per_channel) @ _bit_weights(bits_per_channel)
+
+def _values_to_bits(values, bits_per_channel):
+    """Expands channel values into their low bits_per_channel bits, most significant first."""
+    if bits_per_channel == 1:
+        return values & 1
+    return ((values[:, None] >> np.arange(bits_per_channel - 1, -1, -1, dtype=np.uint8)) & 1).reshape(-1)
+
+def embed_bits(pixels, bits, bits_per_channel=1, use_alpha=False, start_pixel=0):
+    """Writes a 0/1 uint8 bit array into the low bits of a (height, width, channels) uint8 array.
+
+    Bits go MSB-first into the low bits_per_channel bits of R, G, B (and A when
+    use_alpha is set) of each pixel in row-major order, starting at start_pixel.
+    Only the pixels that carry payload bits are read or written.
+    """
+    num_channels = 4 if use_alpha else 3
+    if use_alpha and pixels.shape[-1] != 4:
+        raise ValueError("Alpha-channel embedding needs an RGBA image")
+    values = _bits_to_values(bits, bits_per_channel)
+    num_pixels = -(-values.size // num_channels)
+    region = pixels.reshape(-1, pixels.shape[-1])[start_pixel:start_pixel + num_pixels, :num_channels]
+    channels = region.reshape(-1)
+    keep_mask = 0xFF ^ ((1 << bits_per_channel) - 1)
+    channels[:values.size] = (channels[:values.size] & keep_mask) | values
+    region[...] = channels.reshape(region.shape)
+
+def embed_message_in_image(pixels, message_bytes):
+    """Embeds byte-aligned message data into the LSBs of an image's RGB channels.
+
+    `pixels` is a writable (height, width, 4) uint8 RGBA array. Bits are written
+    MSB-first into R, G, B of each pixel in row-major order; alpha is untouched.
+    """
+    embed_bits(pixels, np.unpackbits(np.frombuffer(bytes(message_bytes), dtype=np.uint8)))
+
+def payload_streams(envelope, bits_per_channel=1, use_alpha=False):
+    """Splits an envelope into (bits, start_pixel, bits_per_channel, use_alpha) carrier streams.
+
+    The header always uses 1 bit of R, G, B from pixel 0 so retrieval can read
+    it before knowing the layout. With the default layout the body simply
+    follows it; otherwise the body starts at BODY_START_PIXEL in its own layout.
+    """
+    bits = np.unpackbits(np.frombuffer(bytes(envelope), dtype=np.uint8))
+    if bits_per_channel == 1 and not use_alpha:
+        return [(bits, 0, 1, False)]
+    header_bits = HEADER_SIZE * 8
+    return [(bits[:header_bits], 0, 1, False), (bits[header_bits:], BODY_START_PIXEL, bits_per_channel, use_alpha)]
+
+def stream_end_pixel(stream):
+    """Index one past the last pixel a carrier stream touches."""
+    bits, start_pixel, bits_per_channel, use_alpha = stream
+    return start_pixel + -(-bits.size // ((4 if use_alpha else 3) * bits_per_channel))
+
+def embed_streams(pixels, streams, first_pixel=0):
+    """Embeds the parts of each carrier stream that fall into pixels.
+
+    pixels holds the image's pixels from index first_pixel onwards (a strip
+    or the whole image), so strips can be processed one after another.
+    """
+    strip_pixels = pixels.shape[0] * pixels.shape[1]
+    for bits, start_pixel, bits_per_channel, use_alpha in streams:
+        bits_per_pixel = (4 if use_alpha else 3) * bits_per_channel
+        low = max(first_pixel, start_pixel)
+        high = min(first_pixel + strip_pixels, stream_end_pixel((bits, start_pixel, bits_per_channel, use_alpha)))
+        if low < high:
+            embed_bits(pixels, bits[(low - start_pixel) * bits_per_pixel:(high - start_pixel) * bits_per_pixel],
+                       bits_per_channel, use_alpha, low - first_pixel)
+
+class LSBReader:
+    """Cursor over the low-bit stream of a (height, width, channels) uint8 array.
+
+    By default the stream is the LSB of R, G, B in row-major order from pixel
+    0; bits_per_channel, use_alpha and start_pixel select other layouts. Each
+    read continues where the previous one stopped and only touches the pixels
+    holding the requested bits, so a header and body can be read in one pass
+    without rescanning the image from pixel 0.
+    """
+
+    def __init__(self, pixels, bits_per_channel=1, use_alpha=False, start_pixel=0):
+        self.num_channels = 4 if use_alpha else 3
+        if use_alpha and pixels.shape[-1] != 4:
+            raise ValueError("Alpha-channel extraction needs an RGBA image")
+        self.pixels = pixels.reshape(-1, pixels.shape[-1])[start_pixel:]
+        self.bits_per_channel = bits_per_channel
+        self.bit_position = 0
+
+    def read(self, num_bytes):
+        """Reads num_bytes of byte-aligned data starting at the current cursor."""
+        num_bits = num_bytes * 8
+        k = self.bits_per_channel
+        first_value = self.bit_position // k
+        last_value = -(-(self.bit_position + num_bits) // k)
+        first_pixel = first_value // self.num_channels
+        last_pixel = -(-last_value // self.num_channels)
+        offset = first_value - first_pixel * self.num_channels
+        values = self.pixels[first_pixel:last_pixel, :self.num_channels].reshape(-1)[offset:offset + last_value - first_value]
+        bits = _values_to_bits(values, k)
+        skip = self.bit_position - first_value * k
+        self.bit_position += num_bits
+        return bytearray(np.packbits(bits[skip:skip + num_bits]).tobytes())
+
+def extract_message_from_image(pixels, num_bytes):
+    """Extracts byte-aligned message data from the LSBs of an image's RGB channels."""
+    return LSBReader(pixels).read(num_bytes)
+
+def _mix64(values):
+    """splitmix64 finalizer applied to a uint64 array (multiplications wrap)."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+class KeyedScatter:
+    """Keyed permutation of the body's value slots, evaluated only for the slots asked for.
+
+    A slot is one channel (R, G, B and optionally A) of a pixel from
+    BODY_START_PIXEL on and holds bits_per_channel bits. Body value i goes to
+    slot permute(i), where permute is a Feistel network over the smallest
+    even-bit domain covering all slots, cycle-walked back into range. The
+    round keys come from the derived key, and a short message only costs as
+    many evaluations as it has values, whatever the image size.
+    """
+
+    def __init__(self, key, num_pixels, use_alpha=False):
+        self.num_channels = 4 if use_alpha else 3
+        self.num_slots = max(0, num_pixels - BODY_START_PIXEL) * self.num_channels
+        self.half_bits = max(1, -(-max(1, self.num_slots - 1).bit_length() // 2))
+        self.mask = np.uint64((1 << self.half_bits) - 1)
+        seed = hmac.new(key, b"stego-scatter", hashlib.sha512).digest()
+        self.round_keys = [np.uint64(k) for k in struct.unpack(f">{FEISTEL_ROUNDS}Q", seed[:FEISTEL_ROUNDS * 8])]
+
+    def _permute(self, values):
+        shift = np.uint64(self.half_bits)
+        left, right = values >> shift, values & self.mask
+        for round_key in self.round_keys:
+            left, right = right, left ^ (_mix64(right ^ round_key) & self.mask)
+        return (left << shift) | right
+
+    def locate(self, start, count):
+        """Returns (pixel indices, channel indices) of body values start .. start + count - 1."""
+        slots = self._permute(np.arange(start, start + count, dtype=np.uint64))
+        walking = np.flatnonzero(slots >= self.num_slots)
+        while walking.size:
+            slots[walking] = self._permute(slots[walking])
+            walking = walking[slots[walking] >= self.num_slots]
+        slots = slots.astype(np.int64)
+        return BODY_START_PIXEL + slots // self.num_channels, slots % self.num_channels
+
+def embed_scattered(pixels, envelope, key, bits_per_channel=1, use_alpha=False):
+    """Embeds the header at pixel 0 as usual and the body at keyed pseudo-random slots."""
+    if use_alpha and pixels.shape[-1] != 4:
+        raise ValueError("Alpha-channel embedding needs an RGBA image")
+    embed_streams(pixels, payload_streams(envelope[:HEADER_SIZE]))
+    bits = np.unpackbits(np.frombuffer(bytes(envelope[HEADER_SIZE:]), dtype=np.uint8))
+    values = _bits_to_values(bits, bits_per_channel)
+    pixel_index, channel = KeyedScatter(key, pixels.shape[0] * pixels.shape[1], use_alpha).locate(0, values.size)
+    flat = pixels.reshape(-1, pixels.shape[-1])
+    keep_mask = 0xFF ^ ((1 << bits_per_channel) - 1)
+    flat[pixel_index, channel] = (flat[pixel_index, channel] & keep_mask) | values
+
+class ScatterReader:
+    """Cursor over body values placed by embed_scattered; reads like LSBReader.read."""
+
+    def __init__(self, pixels, key, bits_per_channel=1, use_alpha=False):
+        if use_alpha and pixels.shape[-1] != 4:
+            raise ValueError("Alpha-channel extraction needs an RGBA image")
+        self.scatter = KeyedScatter(key, pixels.shape[0] * pixels.shape[1], use_alpha)
+        self.pixels = pixels.reshape(-1, pixels.shape[-1])
+        self.bits_per_channel = bits_per_channel
+        self.bit_position = 0
+
+    def read(self, num_bytes):
+        """Reads num_bytes of byte-aligned data starting at the current cursor."""
+        num_bits = num_bytes * 8
+        k = self.bits_per_channel
+        first_value = self.bit_position // k
+        last_value = -(-(self.bit_position + num_bits) // k)
+        pixel_index, channel = self.scatter.locate(first_value, last_value - first_value)
+        bits = _values_to_bits(self.pixels[pixel_index, channel], k)
+        skip = self.bit_position - first_value * k
+        self.bit_position += num_bits
+        return bytearray(np.packbits(bits[skip:skip + num_bits]).tobytes())
+
+def body_end_pixel(header, width, height):
+    """Index one past the last pixel holding the body in the header's bit layout."""
+    use_alpha = bool(header.flags & FLAG_ALPHA)
+    if header.flags & FLAG_SCATTER:
+        return width * height
+    if header.bits_per_channel == 1 and not use_alpha:
+        return -(-(HEADER_SIZE + header.body_length) * 8 // 3)
+    return BODY_START_PIXEL + -(-header.body_length * 8 // ((4 if use_alpha else 3) * header.bits_per_channel))
+
+def body_reader(pixels, header, header_reader, key=None):
+    """Returns a reader positioned at the body for the bit layout recorded in the header."""
+    use_alpha = bool(header.flags & FLAG_ALPHA)
+    if header.flags & FLAG_SCATTER:
+        return ScatterReader(pixels, key, header.bits_per_channel, use_alpha)
+    if header.bits_per_channel == 1 and not use_alpha:
+        return header_reader
+    return LSBReader(pixels, header.bits_per_channel, use_alpha, BODY_START_PIXEL)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {2: 3, 6: 4}  # colour type -> channels for 8-bit RGB and RGBA
+IDAT_CHUNK_SIZE = 1 << 16
+STRIP_ROWS = 256
+PARTIAL_DECODE_FRACTION = 32  # payloads spanning more than 1/32 of the rows are decoded whole by PIL
+
+def _read_png_chunks(f):
+    """Yields (chunk_type, data) pairs from an open PNG file, stopping after IEND."""
+    if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+    while True:
+        length_type = f.read(8)
+        if len(length_type) < 8:
+            return
+        length, chunk_type = struct.unpack(">I4s", length_type)
+        data = f.read(length)
+        f.read(4)  # CRC
+        yield chunk_type, data
+        if chunk_type == b"IEND":
+            return
+
+def _write_png_chunk(f, chunk_type, data):
+    """Writes one length-prefixed, CRC-terminated PNG chunk."""
+    f.write(struct.pack(">I", len(data)) + chunk_type + data)
+    f.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+def unfilter_row(filter_type, row, previous, bpp):
+    """Reverses a PNG row filter; None, Sub and Up are vectorized, Average and Paeth run per byte."""
+    if filter_type == 0:
+        return row.copy()
+    if filter_type == 1:
+        return np.cumsum(row.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+    if filter_type == 2:
+        return row + previous
+    if filter_type not in (3, 4):
+        raise ValueError(f"Unknown PNG filter type {filter_type}")
+    out = bytearray(row.tobytes())
+    prev = previous.tobytes()
+    for i in range(len(out)):
+        left = out[i - bpp] if i >= bpp else 0
+        up = prev[i]
+        if filter_type == 3:
+            out[i] = (out[i] + ((left + up) >> 1)) & 0xFF
+            continue
+        upper_left = prev[i - bpp] if i >= bpp else 0
+        p = left + up - upper_left
+        pa, pb, pc = abs(p - left), abs(p - up), abs(p - upper_left)
+        predictor = left if pa <= pb and pa <= pc else (up if pb <= pc else upper_left)
+        out[i] = (out[i] + predictor) & 0xFF
+    return np.frombuffer(out, dtype=np.uint8)
+
+class PNGRowReader:
+    """Decodes an 8-bit, non-interlaced RGB/RGBA PNG one row at a time.
+
+    Only the zlib window and the current row are held in memory. Rows can be
+    fetched decoded (read_row/read_rows) or still filtered (read_raw_row) for
+    copying straight into a PNGRowWriter.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.chunks = _read_png_chunks(self.file)
+        try:
+            chunk_type, ihdr = next(self.chunks)
+        except (ValueError, StopIteration):
+            chunk_type, ihdr = None, b""
+        if chunk_type != b"IHDR" or len(ihdr) != 13:
+            self.file.close()
+            raise ValueError("Not a PNG file")
+        width, height, depth, colour_type, _, _, interlace = struct.unpack(">IIBBBBB", ihdr)
+        if depth != 8 or colour_type not in PNG_CHANNELS or interlace:
+            self.file.close()
+            raise ValueError("Streaming supports 8-bit, non-interlaced RGB/RGBA PNG images only")
+        self.width, self.height = width, height
+        self.channels = PNG_CHANNELS[colour_type]
+        self.row_size = width * self.channels + 1  # filter type byte + pixel bytes
+        self.rows_read = 0
+        self.previous = np.zeros(width * self.channels, dtype=np.uint8)
+
+        # Chunks ahead of the image data are kept so a writer can reproduce them
+        self.header_chunks = [(b"IHDR", ihdr)]
+        self._pending = b""
+        for chunk_type, data in self.chunks:
+            if chunk_type == b"IDAT":
+                self._pending = data
+                break
+            self.header_chunks.append((chunk_type, data))
+        self._decompressor = zlib.decompressobj()
+        self._buffer = bytearray()
+
+    def _next_idat(self):
+        """Returns the next IDAT payload; raises ValueError if the image data ends early."""
+        for chunk_type, data in self.chunks:
+            if chunk_type == b"IDAT":
+                return data
+            break
+        raise ValueError("Truncated PNG image data")
+
+    def read_raw_row(self):
+        """Returns the next row still filtered: the filter type byte followed by the row bytes."""
+        while len(self._buffer) < self.row_size:
+            data = self._decompressor.unconsumed_tail or self._pending or self._next_idat()
+            self._pending = b""
+            self._buffer += self._decompressor.decompress(data, max(self.row_size, IDAT_CHUNK_SIZE))
+        raw = bytes(self._buffer[:self.row_size])
+        del self._buffer[:self.row_size]
+        self.rows_read += 1
+        return raw
+
+    def read_row(self):
+        """Returns the next row decoded to a flat uint8 array of width * channels bytes."""
+        raw = self.read_raw_row()
+        self.previous = unfilter_row(raw[0], np.frombuffer(raw, dtype=np.uint8, offset=1), self.previous, self.channels)
+        return self.previous
+
+    def read_rows(self, num_rows):
+        """Decodes the next num_rows rows into a (num_rows, width, channels) array."""
+        strip = np.empty((num_rows, self.width, self.channels), dtype=np.uint8)
+        for i in range(num_rows):
+            strip[i] = self.read_row().reshape(self.width, self.channels)
+        return strip
+
+    def finish(self):
+        """Consumes the rest of the file and returns the ancillary chunks after the image data."""
+        return [(t, d) for t, d in self.chunks if t not in (b"IDAT", b"IEND")]
+
+    def close(self):
+        self.file.close()
+
+class PNGRowWriter:
+    """Encodes PNG rows incrementally, flushing compressed data as IDAT chunks."""
+
+    def __init__(self, path, header_chunks, compress_level=6):
+        self.file = open(path, "wb")
+        self.file.write(PNG_SIGNATURE)
+        for chunk_type, data in header_chunks:
+            _write_png_chunk(self.file, chunk_type, data)
+        self._compressor = zlib.compressobj(compress_level)
+        self._buffer = bytearray()
+
+    def write_raw_row(self, raw):
+        """Appends an already filtered row (filter type byte included)."""
+        self._buffer += self._compressor.compress(raw)
+        if len(self._buffer) >= IDAT_CHUNK_SIZE:
+            _write_png_chunk(self.file, b"IDAT", bytes(self._buffer))
+            self._buffer.clear()
+
+    def write_row(self, row, previous):
+        """Appends a decoded row using the Up filter against the previously written row."""
+        self.write_raw_row(b"\x02" + (row - previous).tobytes())
+
+    def close(self, trailer_chunks=()):
+        """Flushes the image data, writes any trailing chunks and IEND, and closes the file."""
+        self._buffer += self._compressor.flush()
+        if self._buffer:
+            _write_png_chunk(self.file, b"IDAT", bytes(self._buffer))
+        for chunk_type, data in trailer_chunks:
+            _write_png_chunk(self.file, chunk_type, data)
+        _write_png_chunk(self.file, b"IEND", b"")
+        self.file.close()
+
+def image_strips(image, mode=None, first_row=0):
+    """Yields (top, bottom, raw bytes) for bands of STRIP_ROWS rows from first_row on, converted to mode when given.
+
+    Converting band by band means a full converted copy of the image never exists.
+    """
+    width, height = image.size
+    for top in range(first_row, height, STRIP_ROWS):
+        bottom = min(top + STRIP_ROWS, height)
+        strip = image.crop((0, top, width, bottom))
+        if mode is not None and strip.mode != mode:
+            strip = strip.convert(mode)
+        yield top, bottom, strip.tobytes()
+
+def load_pixels(path, use_alpha=False):
+    """Decodes an image into a writable (height, width, channels) uint8 array in its native RGB/RGBA layout.
+
+    Other modes are converted band by band, to RGBA only when they carry
+    transparency or the alpha channel will hold payload. PIL still decodes
+    the whole image into its own buffer; each band is then cropped out of it,
+    converted if needed, and serialised with tobytes() before being copied
+    into the preallocated array. Those per-band copies are STRIP_ROWS rows
+    each, so peak memory is about two full images, and PIL's buffer is
+    released before returning.
+    """
+    with Image.open(path) as image:
+        mode = "RGBA" if use_alpha or "A" in image.getbands() or "transparency" in image.info else "RGB"
+        pixels = np.empty((image.height, image.width, len(mode)), dtype=np.uint8)
+        for top, bottom, strip in image_strips(image, mode):
+            pixels[top:bottom] = np.frombuffer(strip, dtype=np.uint8).reshape(bottom - top, image.width, len(mode))
+    return pixels
+
+class StegoPixels:
+    """Pixels of a stego image, decoded only as far as the payload needs.
+
+    8-bit, non-interlaced RGB/RGBA PNGs are decoded row by row into a
+    preallocated array on ensure(); rows never reached are never decoded,
+    and their pages are never touched. Other images, and payloads spanning
+    many rows, are decoded whole by PIL, whose C unfiltering is much faster
+    than the per-byte Average/Paeth loop once more than a few rows are needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self.reader = PNGRowReader(path)
+        except ValueError:
+            self.reader = None
+            with trace_stage("decode_image") as stage:
+                self.pixels = load_pixels(path)
+                stage["bytes"] = self.pixels.nbytes
+        else:
+            self.pixels = np.empty((self.reader.height, self.reader.width, self.reader.channels), dtype=np.uint8)
+        self.height, self.width = self.pixels.shape[:2]
+
+    def ensure(self, end_pixel):
+        """Decodes every row up to the one holding pixel end_pixel - 1."""
+        if self.reader is None:
+            return
+        rows = min(self.height, -(-end_pixel // self.width))
+        if rows - self.reader.rows_read > self.height // PARTIAL_DECODE_FRACTION:
+            with trace_stage("decode_image", self.pixels[self.reader.rows_read:].nbytes), Image.open(self.path) as image:
+                for top, bottom, strip in image_strips(image, first_row=self.reader.rows_read):
+                    self.pixels[top:bottom] = np.frombuffer(strip, dtype=np.uint8).reshape(bottom - top, self.width, -1)
+            self.close()
+            self.reader = None
+            return
+        try:
+            with trace_stage("decode_rows", self.pixels[self.reader.rows_read:rows].nbytes):
+                for row in range(self.reader.rows_read, rows):
+                    self.pixels[row] = self.reader.read_row().reshape(self.width, -1)
+        except zlib.error:
+            raise ValueError("Corrupted PNG image data") from None
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+
+def embed_message_streaming(cover_path, output_path, message_bytes, strip_rows=STRIP_ROWS, bits_per_channel=1, use_alpha=False,
+                            compress_level=6):
+    """Embeds an envelope into a PNG cover strip by strip without loading the whole image.
+
+    Rows carrying payload bits are decoded and embedded strip_rows at a time;
+    every row after them is copied through still filtered, so peak memory is
+    one strip plus zlib buffers. The cover keeps its own RGB/RGBA layout.
+    The image is written to a temporary file beside output_path and moved
+    into place at the end, so the output may be the cover itself and a
+    failed run leaves nothing behind.
+    """
+    streams = payload_streams(message_bytes, bits_per_channel, use_alpha)
+    reader = PNGRowReader(cover_path)
+    writer = None
+    temp_path = f"{output_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        if len(message_bytes) - HEADER_SIZE > body_capacity(reader.width, reader.height, bits_per_channel, use_alpha):
+            raise ValueError("Payload is too large to fit into the cover image.")
+        if use_alpha and reader.channels != 4:
+            raise ValueError("Alpha-channel embedding needs an RGBA cover")
+        writer = PNGRowWriter(temp_path, reader.header_chunks, compress_level)
+        payload_rows = -(-max(stream_end_pixel(stream) for stream in streams) // reader.width)
+        written = np.zeros(reader.width * reader.channels, dtype=np.uint8)
+
+        for start in range(0, payload_rows, strip_rows):
+            strip = reader.read_rows(min(strip_rows, payload_rows - start))
+            embed_streams(strip, streams, start * reader.width)
+            for row in strip.reshape(len(strip), -1):
+                writer.write_row(row, written)
+                written = row
+
+        # The first untouched row may be filtered against a modified row, so re-filter it
+        if reader.rows_read < reader.height:
+            writer.write_row(reader.read_row(), written)
+        while reader.rows_read < reader.height:
+            writer.write_raw_row(reader.read_raw_row())
+        writer.close(reader.finish())
+        reader.close()
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if writer is not None:
+            writer.file.close()
+            os.remove(temp_path)
+        raise
+    finally:
+        reader.close()
+
+OUTPUT_FORMATS = {".png": "PNG", ".webp": "WEBP", ".tif": "TIFF", ".tiff": "TIFF", ".bmp": "BMP"}  # lossless only; anything else is saved as PNG
+OUTPUT_PROFILES = {
+    "fast": {
+        "PNG": {"compress_level": 1, "compress_type": zlib.Z_RLE},
+        "WEBP": {"lossless": True, "exact": True, "method": 0, "quality": 0},
+        "TIFF": {"compression": "raw"},
+        "BMP": {},
+    },
+    "balanced": {
+        "PNG": {"compress_level": 6},
+        "WEBP": {"lossless": True, "exact": True, "method": 4, "quality": 50},
+        "TIFF": {"compression": "tiff_lzw"},
+        "BMP": {},
+    },
+    "small": {
+        "PNG": {"compress_level": 9, "optimize": True},
+        "WEBP": {"lossless": True, "exact": True, "method": 6, "quality": 80},
+        "TIFF": {"compression": "tiff_adobe_deflate"},
+        "BMP": {},
+    },
+}
+EncodeReport = namedtuple("EncodeReport", "format profile seconds size")
+
+def output_format(output_path):
+    """Lossless image format for an output path, chosen by extension (PNG by default)."""
+    return OUTPUT_FORMATS.get(os.path.splitext(output_path)[1].lower(), "PNG")
+
+def save_png_parallel(pixels, output_path, compress_level=6, threads=None):
+    """Writes an RGB/RGBA PNG whose image data is deflated in row bands on several threads.
+
+    Every row uses the Up filter. Each band is compressed as raw deflate
+    (zlib releases the GIL) and ended with a sync flush, so the bands join
+    into one valid zlib stream at the cost of the window across band edges.
+    """
+    height, width, channels = pixels.shape
+    rows = pixels.reshape(height, -1)
+    filtered = np.empty((height, rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+
+    threads = threads or os.cpu_count() or 1
+    band_rows = -(-height // threads)
+    bands = [filtered[top:top + band_rows] for top in range(0, height, band_rows)]
+
+    def deflate(index):
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+        last = index == len(bands) - 1
+        return compressor.compress(bands[index]) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pieces = list(executor.map(deflate, range(len(bands))))
+    checksum = 1
+    for band in bands:
+        checksum = zlib.adler32(band, checksum)
+
+    pieces[0] = b"\x78\x9c" + pieces[0]  # zlib header: deflate, 32 KiB window
+    pieces[-1] += struct.pack(">I", checksum)
+    with open(output_path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        _write_png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6 if channels == 4 else 2, 0, 0, 0))
+        for piece in pieces:
+            _write_png_chunk(f, b"IDAT", piece)
+        _write_png_chunk(f, b"IEND", b"")
+
+def save_stego_image(pixels, output_path, profile="balanced", threads=1, use_alpha=False):
+    """Saves stego pixels losslessly in the format given by the output extension.
+
+    profile picks the compression settings from OUTPUT_PROFILES; PNG output
+    with threads > 1 goes through save_png_parallel. Returns an EncodeReport.
+    """
+    image_format = output_format(output_path)
+    if image_format == "BMP" and use_alpha:
+        raise ValueError("BMP output cannot keep an alpha-channel payload.")
+    start = time.perf_counter()
+    with trace_stage("write_image", pixels.nbytes) as stage:
+        if image_format == "PNG" and threads > 1:
+            save_png_parallel(pixels, output_path, OUTPUT_PROFILES[profile]["PNG"]["compress_level"], threads)
+        else:
+            Image.fromarray(pixels, "RGBA" if pixels.shape[-1] == 4 else "RGB").save(output_path, image_format, **OUTPUT_PROFILES[profile][image_format])
+        stage["output_bytes"] = os.path.getsize(output_path)
+    return EncodeReport(image_format, profile, time.perf_counter() - start, stage["output_bytes"])
+
+class PayloadKindError(ValueError):
+    """The image holds another kind of payload than the one asked for (files instead of a message or the reverse)."""
+
+def payload_kind(encoding):
+    """What a payload with this encoding holds, as named in error messages."""
+    return PAYLOAD_KINDS.get(encoding, f"an unknown payload (encoding {encoding})")
+
+class ShardError(ValueError):
+    """A set of shard images that cannot be reassembled (missing, duplicate or foreign shards)."""
+
+def pack_shard_record(key, index, count, digest):
+    """Builds the shard record (index, count, ciphertext hash) followed by its MAC."""
+    record = struct.pack(SHARD_FORMAT, index, count, digest)
+    return record + record_mac(key, SHARD_MAC_LABEL, record)
+
+def unpack_shard_record(key, record):
+    """Verifies a shard record and returns (index, count, digest)."""
+    fields, mac = bytes(record[:-HEADER_MAC_SIZE]), bytes(record[-HEADER_MAC_SIZE:])
+    if not hmac.compare_digest(mac, record_mac(key, SHARD_MAC_LABEL, fields)):
+        raise ValueError("Corrupted shard record")
+    index, count, digest = struct.unpack(SHARD_FORMAT, fields)
+    if index >= count:
+        raise ValueError("Corrupted shard record")
+    return index, count, digest
+
+def split_shards(total, capacities):
+    """Sizes of the slices that spread total bytes over covers in proportion to their capacities."""
+    room = sum(capacities)
+    if total > room:
+        raise ValueError(f"Payload needs {total} bytes but the covers hold only {room}.")
+    sizes = [total * capacity // room for capacity in capacities]
+    spare = [i for i, capacity in enumerate(capacities) if sizes[i] < capacity]
+    for i in spare[:total - sum(sizes)]:
+        sizes[i] += 1
+    return sizes
+
+def embed_envelope(job):
+    """Worker entry point: embeds one envelope into a cover and saves it; returns (EncodeReport, trace events or None)."""
+    cover_path, output_path, envelope, key, bits_per_channel, use_alpha, scatter, profile, threads, trace = job
+    tracer = StageTracer() if trace else None
+    with tracing(tracer):
+        report = embed_envelope_in_cover(cover_path, output_path, envelope, key, bits_per_channel=bits_per_channel, use_alpha=use_alpha,
+                                         scatter=scatter, profile=profile, threads=threads)
+    return report, tracer and tracer.events
+
+def embed_shards(cover_paths, output_paths, data, password, *, cipher_id=CIPHER_GCM, encoding=ENCODING_TEXT, bits_per_channel=1,
+                 use_alpha=False, kdf_id=KDF_SCRYPT, salt=None, scatter=False, profile="balanced", threads=1, workers=None):
+    """Encrypts data once and spreads the ciphertext over several covers, embedded in parallel.
+
+    Every cover gets a slice proportional to its capacity, behind its own
+    header (flagged FLAG_SHARD) and a MAC'd shard record holding the shard
+    index, the shard count and the SHA-256 of the whole ciphertext. Returns
+    the EncodeReport of every output, in cover order. When tracing, the
+    workers' stages are added to the active tracer.
+    """
+    if len(cover_paths) != len(output_paths):
+        raise ValueError("Give one output path per cover.")
+    if len(cover_paths) > MAX_SHARDS:
+        raise ValueError(f"At most {MAX_SHARDS} covers can share a payload.")
+    capacities = []
+    for path in cover_paths:
+        with Image.open(path) as image:
+            width, height = image.size
+        capacity = body_capacity(width, height, bits_per_channel, use_alpha, scatter) - SHARD_RECORD_SIZE
+        if capacity <= 0:
+            raise ValueError(f"Cover '{path}' is too small to hold a shard.")
+        capacities.append(capacity)
+
+    salt = salt or os.urandom(SALT_SIZE)
+    cost = DEFAULT_KDF_COST[kdf_id]
+    key = derive_key(password, salt, kdf_id, cost)
+    with trace_stage("encrypt", len(data)):
+        nonce, ciphertext = aes_encrypt(data, key, cipher_id)
+    digest = hashlib.sha256(ciphertext).digest()
+    flags = FLAG_SHARD | (FLAG_ALPHA if use_alpha else 0) | (FLAG_SCATTER if scatter else 0)
+
+    tracer = active_tracer()
+    jobs = []
+    offset = 0
+    for index, size in enumerate(split_shards(len(ciphertext), capacities)):
+        header = Header(cipher_id, encoding, bits_per_channel, flags, kdf_id, cost, salt, nonce, SHARD_RECORD_SIZE + size)
+        envelope = pack_header(key, header) + pack_shard_record(key, index, len(capacities), digest) + ciphertext[offset:offset + size]
+        jobs.append((cover_paths[index], output_paths[index], envelope, key, bits_per_channel, use_alpha, scatter, profile, threads,
+                     tracer is not None))
+        offset += size
+    workers = min(len(jobs), workers or os.cpu_count() or 1)
+    with trace_stage("embed_shards", len(ciphertext)), ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(embed_envelope, jobs))
+    for _, events in results:
+        if tracer:
+            tracer.events.extend(events)
+    return [report for report, _ in results]
+
+def read_shard(job):
+    """Worker entry point: verifies one shard image.
+
+    Returns ((path, header, index, count, digest, slice), trace events or None).
+    """
+    stego_path, password, trace = job
+    tracer = StageTracer() if trace else None
+    with tracing(tracer):
+        stego = StegoPixels(stego_path)
+        try:
+            height, width = stego.pixels.shape[:2]
+            reader = LSBReader(stego.pixels)
+            stego.ensure(BODY_START_PIXEL)
+            header, key = unpack_header(reader.read(HEADER_SIZE), password, width, height)
+            if not header.flags & FLAG_SHARD:
+                raise ShardError(f"'{stego_path}' does not hold a shard.")
+            stego.ensure(body_end_pixel(header, width, height))
+            with trace_stage("extract", header.body_length):
+                body = body_reader(stego.pixels, header, reader, key).read(header.body_length)
+        finally:
+            stego.close()
+    index, count, digest = unpack_shard_record(key, body[:SHARD_RECORD_SIZE])
+    return (stego_path, header, index, count, digest, bytes(body[SHARD_RECORD_SIZE:])), tracer and tracer.events
+
+def extract_shards(stego_paths, password, workers=None):
+    """Reads shard images in parallel (in any order), reassembles and decrypts them.
+
+    Raises ShardError naming missing or duplicate shards, or images from a
+    different payload, before anything is decrypted. Returns (header, plaintext).
+    When tracing, the workers' stages are added to the active tracer.
+    """
+    tracer = active_tracer()
+    workers = min(len(stego_paths), workers or os.cpu_count() or 1)
+    with trace_stage("extract_shards"), ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(read_shard, [(path, password, tracer is not None) for path in stego_paths]))
+    shards = []
+    for shard, events in results:
+        shards.append(shard)
+        if tracer:
+            tracer.events.extend(events)
+
+    first_path, header, _, count, digest, _ = shards[0]
+    found = {}
+    for path, shard_header, index, shard_count, shard_digest, data in shards:
+        if shard_digest != digest or shard_count != count or shard_header[:-1] != header[:-1]:
+            raise ShardError(f"'{path}' belongs to a different payload than '{first_path}'.")
+        if index in found:
+            raise ShardError(f"Shard {index + 1} of {count} appears twice: '{found[index][0]}' and '{path}'.")
+        found[index] = (path, data)
+    missing = [str(index + 1) for index in range(count) if index not in found]
+    if missing:
+        raise ShardError(f"Missing shard(s) {', '.join(missing)} of {count}.")
+
+    ciphertext = b"".join(found[index][1] for index in range(count))
+    if hashlib.sha256(ciphertext).digest() != digest:
+        raise ShardError("Reassembled payload does not match its hash.")
+    key = derive_key(password, header.salt, header.kdf_id, header.kdf_cost)
+    with trace_stage("decrypt", len(ciphertext)):
+        return header, aes_decrypt(ciphertext, key, header.cipher_id, header.nonce)
+
+def embed_envelope_in_cover(cover_path, output_path, envelope, key, *, stream=False, strip_rows=STRIP_ROWS, bits_per_channel=1,
+                            use_alpha=False, scatter=False, profile="balanced", threads=1,
+                            too_large="Payload is too large to fit into the cover image."):
+    """Embeds a packed envelope into the cover and saves the stego image; returns an EncodeReport.
+
+    key is the one that packed the envelope (it places a scattered body).
+    The other options are described by the scripts' hide_message and hide_image.
+    """
+    if stream:
+        if output_format(output_path) != "PNG":
+            raise ValueError("Streaming writes PNG output only.")
+        start = time.perf_counter()
+        with trace_stage("embed_streaming", len(envelope)):
+            embed_message_streaming(cover_path, output_path, envelope, strip_rows, bits_per_channel, use_alpha,
+                                    OUTPUT_PROFILES[profile]["PNG"]["compress_level"])
+        return EncodeReport("PNG", profile, time.perf_counter() - start, os.path.getsize(output_path))
+
+    with trace_stage("decode_cover") as stage:
+        pixels = load_pixels(cover_path, use_alpha)
+        stage["bytes"] = pixels.nbytes
+
+    # Check capacity
+    height, width = pixels.shape[:2]
+    if len(envelope) - HEADER_SIZE > body_capacity(width, height, bits_per_channel, use_alpha, scatter):
+        raise ValueError(too_large)
+
+    if scatter:
+        with trace_stage("embed_scattered", len(envelope)):
+            embed_scattered(pixels, envelope, key, bits_per_channel, use_alpha)
+    else:
+        with trace_stage("embed", len(envelope)):
+            embed_streams(pixels, payload_streams(envelope, bits_per_channel, use_alpha))
+    return save_stego_image(pixels, output_path, profile, threads, use_alpha)
+
+def read_password(password_fd=None, password_env=None, confirm=False):
+    """Reads the key password from a file descriptor, an environment variable or the terminal.
+
+    The descriptor and the variable are used only when given; otherwise the
+    password is prompted for, twice when confirm is set. Raises ValueError for
+    an unset variable, a mismatched confirmation or an empty password.
+    """
+    if password_fd is not None:
+        with os.fdopen(password_fd, "r", closefd=False) as stream:
+            password = stream.readline().rstrip("\r\n")
+    elif password_env:
+        if password_env not in os.environ:
+            raise ValueError(f"The {password_env} environment variable is not set.")
+        password = os.environ[password_env]
+    else:
+        password = input("Enter the key password: ")
+        if confirm and password != input("Confirm the key password: "):
+            raise ValueError("Passwords do not match.")
+    if not password:
+        raise ValueError("The key password must not be empty.")
+    return password
+
+def load_manifest(path):
+    """Loads batch rows from a CSV file with a header row or from a JSON-lines file."""
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+def run_batch(run_job, manifest_path, action, password, cipher_id=CIPHER_GCM, workers=None, kdf_id=KDF_SCRYPT, trace_path=None):
+    """Fans manifest rows out over a process pool and prints one status line per job.
+
+    run_job is the script's worker entry point; it takes one job tuple and
+    returns (row, error or None, result, trace events or None).
+
+    Every image saved in one run shares a salt, so each worker's KEY_CACHE
+    runs the KDF once instead of once per image. With trace_path, every job
+    is traced in its worker and all events are written to one Chrome trace.
+    Returns the number of failed jobs.
+    """
+    entries = load_manifest(manifest_path)
+    salt = os.urandom(SALT_SIZE)
+    jobs = [(row, action, entry, password, cipher_id, kdf_id, salt, trace_path is not None) for row, entry in enumerate(entries, start=1)]
+    _, failures = run_jobs(run_job, jobs, workers, trace_path)
+    return failures
+
+def run_jobs(run_job, jobs, workers=None, trace_path=None, describe=str):
+    """Maps run_job over jobs on a process pool and prints one status line per job.
+
+    run_job returns (row, error or None, result, trace events or None) and
+    describe(result) is printed for a job without error. With trace_path, the
+    events of every job are written to one Chrome trace. Returns the result of
+    every job in row order and the number of failed jobs.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+
+    results = []
+    failures = 0
+    events = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for row, error, result, job_events in executor.map(run_job, jobs, chunksize=chunksize):
+            results.append(result)
+            events.extend(job_events or [])
+            if error is None:
+                print(f"[ok] row {row}: {describe(result)}")
+            else:
+                failures += 1
+                print(f"[error] row {row}: {error}")
+    if trace_path:
+        write_trace(events, trace_path)
+        print(f"Trace saved to {trace_path}")
+    print(f"Batch finished: {len(jobs) - failures} succeeded, {failures} failed.")
+    return results, failures
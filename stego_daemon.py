@@ -0,0 +1,353 @@
+"""-------------------------------------Steganography Service Daemon: By Damodhar Pai------------------------------------------------"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from stage_trace import StageTracer
+from stego import load_tool
+
+SOCKET_NAME = "stego.sock"
+MAX_PENDING = 64  # requests in flight before the daemon stops reading from clients
+REQUEST_LIMIT = 16 * 1024 * 1024  # longest accepted request line; large payloads belong in files or shared memory
+LATENCY_WINDOW = 1024  # recent latencies kept per operation for the percentiles
+
+def warm_worker():
+    """Process-pool initializer: import the tools once so requests never pay for it."""
+    for tool in ("text", "image", "metrics"):
+        load_tool(tool)
+
+def read_shared_bytes(spec):
+    """Copies spec["size"] bytes out of the named shared memory segment the client created.
+
+    The segment stays owned by the client: it is attached by name and only
+    closed here, never unlinked. Before Python 3.13 (which attaches with
+    track=False) attaching registers the segment with this process's resource
+    tracker, so the name the client sent is unregistered again; otherwise the
+    tracker would unlink the client's segment when the worker exits.
+    """
+    name = spec["name"]
+    if sys.version_info >= (3, 13):
+        segment = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        segment = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            # POSIX segments are tracked under their name with a leading slash
+            resource_tracker.unregister("/" + name.lstrip("/"), "shared_memory")
+    try:
+        size = spec.get("size", segment.size)
+        if size > segment.size:
+            raise ValueError("Shared memory segment is smaller than the requested size")
+        return bytes(segment.buf[:size])
+    finally:
+        segment.close()
+
+def _payload(request, field):
+    """Returns a request field given inline or as a {"name", "size"} shared memory reference in <field>_shm."""
+    if f"{field}_shm" in request:
+        return read_shared_bytes(request[f"{field}_shm"])
+    return request[field]
+
+def run_request(request):
+    """Worker entry point: runs one save/retrieve/metrics request and returns its JSON-safe result.
+
+    With "trace": true the result also carries the request's stage events.
+    """
+    tracer = StageTracer() if request.get("trace") else None
+    result = _run_request(request, tracer)
+    if tracer:
+        result["trace"] = tracer.events
+    return result
+
+def _run_request(request, tracer):
+    op = request["op"]
+    if op not in ("save", "retrieve", "metrics"):
+        raise ValueError(f"Unknown op {op!r}")
+    if op == "metrics":
+        metrics = load_tool("metrics").compare_images(request["cover"], request["stego"], tracer=tracer)
+        return {k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in metrics.items()}
+
+    kind = request.get("kind", "text")
+    if kind not in ("text", "image"):
+        raise ValueError(f"Unknown kind {kind!r}")
+    tool = load_tool(kind)
+    password = request["password"]
+
+    if op == "save":
+        options = dict(
+            cipher_id=tool.CIPHERS[request.get("cipher", "gcm")],
+            stream=request.get("stream", False),
+            strip_rows=request.get("strip_rows", tool.STRIP_ROWS),
+            bits_per_channel=request.get("bits_per_channel", 1),
+            use_alpha=request.get("alpha", False),
+            kdf_id=tool.KDFS[request.get("kdf", "scrypt")],
+            scatter=request.get("scatter", False),
+            profile=request.get("profile", "balanced"),
+            threads=request.get("threads", 1),
+            tracer=tracer,
+        )
+        if kind == "text":
+            message = _payload(request, "message")
+            if isinstance(message, bytes):
+                message = message.decode("utf-8")
+            report = tool.hide_message(request["cover"], message, request["output"], password, **options)
+        else:
+            report = tool.hide_image(request["cover"], _payload(request, "secret"), request["output"], password,
+                                     encoding=request.get("encoding", "auto"), **options)
+        return {"output": request["output"], "format": report.format, "encode_s": report.seconds, "bytes": report.size}
+
+    if op == "retrieve":
+        if kind == "image":
+            tool.reveal_image(request["stego"], request["output"], password, tracer=tracer)
+            return {"output": request["output"]}
+        message = tool.reveal_message(request["stego"], password, tracer=tracer)
+        if request.get("output"):
+            with open(request["output"], "w", encoding="utf-8") as f:
+                f.write(message)
+            return {"output": request["output"]}
+        return {"message": message}
+
+class StegoDaemon:
+    """Serves JSON-lines requests over asyncio streams from a warm process pool.
+
+    Every request line is answered with one JSON line carrying the same "id",
+    so a client may pipeline many requests and match out-of-order replies.
+    At most max_pending requests run at once; further lines are not read
+    until a slot frees up, which pushes back on clients through the socket.
+    """
+
+    def __init__(self, workers=None, max_pending=MAX_PENDING):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        self.max_pending = max_pending
+        self.slots = None
+        self.in_flight = 0
+        self.started = time.monotonic()
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.counts = defaultdict(int)
+        self.errors = defaultdict(int)
+
+    async def warm_up(self):
+        """Starts every worker process (running warm_worker) before the first request arrives."""
+        self.slots = asyncio.Semaphore(self.max_pending)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, time.sleep, 0.05) for _ in range(self.workers)))
+
+    def stats(self):
+        """Request counts, errors and latency percentiles (ms) per operation."""
+        operations = {}
+        for op, samples in self.latencies.items():
+            ordered = sorted(samples)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            operations[op] = {
+                "count": self.counts[op],
+                "errors": self.errors[op],
+                "mean_ms": sum(ordered) / len(ordered),
+                "p50_ms": pick(0.50),
+                "p95_ms": pick(0.95),
+                "p99_ms": pick(0.99),
+                "max_ms": ordered[-1],
+            }
+        return {"uptime_s": time.monotonic() - self.started, "workers": self.workers, "in_flight": self.in_flight, "operations": operations}
+
+    async def respond(self, line, writer, write_lock):
+        """Runs one request line and writes its reply; always releases the request's slot."""
+        start = time.perf_counter()
+        request_id, op = None, "invalid"
+        try:
+            request = json.loads(line)
+            request_id, op = request.get("id"), request.get("op", "invalid")
+            if op == "ping":
+                reply = {"id": request_id, "ok": True, "result": "pong"}
+            elif op == "stats":
+                reply = {"id": request_id, "ok": True, "result": self.stats()}
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, run_request, request)
+                reply = {"id": request_id, "ok": True, "result": result}
+        except KeyError as e:
+            reply = {"id": request_id, "ok": False, "error": f"Missing request field {e}"}
+        except Exception as e:
+            reply = {"id": request_id, "ok": False, "error": str(e)}
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+
+        latency = (time.perf_counter() - start) * 1000
+        self.counts[op] += 1
+        self.errors[op] += not reply["ok"]
+        self.latencies[op].append(latency)
+        reply["latency_ms"] = latency
+        async with write_lock:
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        """Reads request lines from one client until EOF and multiplexes them onto the pool."""
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                await self.slots.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    self.slots.release()
+                    writer.write(b'{"id": null, "ok": false, "error": "Request line too long"}\n')
+                    break
+                if not line.strip():
+                    self.slots.release()
+                    if not line:
+                        break
+                    continue
+                self.in_flight += 1
+                task = asyncio.create_task(self.respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+def default_socket():
+    """$XDG_RUNTIME_DIR/stego.sock, or stego.sock in a per-user 0700 directory under the temp dir.
+
+    Requests carry passwords, so the socket never sits directly in a shared
+    directory where another user could pre-create or race for the path.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, SOCKET_NAME)
+    return os.path.join(tempfile.gettempdir(), f"stego-{os.getuid()}", SOCKET_NAME)
+
+def private_socket_dir(path):
+    """Creates the socket's directory (mode 0700) if needed and checks nobody else owns or can enter it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ValueError(f"{directory} must be a directory owned by you with mode 0700")
+
+async def serve_socket(daemon, path):
+    """Listens on a Unix socket (mode 0600) until SIGINT or SIGTERM."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX)
+        try:
+            probe.connect(path)
+            raise ValueError(f"A daemon is already listening on {path}")
+        except ConnectionRefusedError:
+            os.unlink(path)  # stale socket left by a daemon that did not shut down cleanly
+        finally:
+            probe.close()
+
+    await daemon.warm_up()
+    umask = os.umask(0o077)  # the socket is created 0600, with no window before a chmod
+    try:
+        server = await asyncio.start_unix_server(daemon.handle_connection, path, limit=REQUEST_LIMIT)
+    finally:
+        os.umask(umask)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    print(f"Listening on {path} with {daemon.workers} warm workers", file=sys.stderr)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        os.unlink(path)
+
+class StdoutWriter:
+    """The slice of asyncio.StreamWriter that handle_connection uses, writing to stdout."""
+
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+async def serve_stdio(daemon):
+    """Serves requests read from stdin, writing replies to stdout, until stdin closes.
+
+    stdin is read on a thread so pipes, terminals and redirected files all work.
+    """
+    await daemon.warm_up()
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=REQUEST_LIMIT, loop=loop)
+
+    def feed_stdin():
+        for line in sys.stdin.buffer:
+            loop.call_soon_threadsafe(reader.feed_data, line)
+        loop.call_soon_threadsafe(reader.feed_eof)
+
+    threading.Thread(target=feed_stdin, daemon=True).start()
+    await daemon.handle_connection(reader, StdoutWriter())
+
+def send_requests(path, requests):
+    """Client helper: sends request dicts over the Unix socket and returns the replies in arrival order."""
+    with socket.socket(socket.AF_UNIX) as client:
+        client.connect(path)
+        client.sendall("".join(json.dumps(request) + "\n" for request in requests).encode())
+        client.shutdown(socket.SHUT_WR)
+        with client.makefile("r", encoding="utf-8") as replies:
+            return [json.loads(line) for line in replies]
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve save/retrieve/metrics requests from warm worker processes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the daemon.")
+    serve_parser.add_argument("--socket", help="Unix socket path (default: $XDG_RUNTIME_DIR/stego.sock, else a private per-user directory)")
+    serve_parser.add_argument("--stdio", action="store_true", help="Read JSON-lines requests from stdin and reply on stdout instead of a socket")
+    serve_parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    serve_parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help=f"Requests in flight before reading pauses (default: {MAX_PENDING})")
+
+    call_parser = subparsers.add_parser("call", help="Send JSON-lines requests from stdin to a running daemon.")
+    call_parser.add_argument("--socket", help="Unix socket path (default: $XDG_RUNTIME_DIR/stego.sock, else a private per-user directory)")
+
+    args = parser.parse_args()
+    if not getattr(args, "stdio", False) and args.socket is None:
+        args.socket = default_socket()
+        try:
+            private_socket_dir(args.socket)
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 1
+
+    if args.command == "call":
+        try:
+            requests = [json.loads(line) for line in sys.stdin if line.strip()]
+            for reply in send_requests(args.socket, requests):
+                print(json.dumps(reply))
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}")
+            return 1
+        return 0
+
+    daemon = StegoDaemon(args.workers, args.max_pending)
+    try:
+        asyncio.run(serve_stdio(daemon) if args.stdio else serve_socket(daemon, args.socket))
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        daemon.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())